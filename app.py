@@ -1,46 +1,50 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session
+import threading
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, flash, redirect, url_for, session, abort
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy.orm import joinedload, selectinload
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, TextAreaField, DecimalField, SelectField, IntegerField, PasswordField
 from wtforms.validators import DataRequired, Email, NumberRange
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
 from datetime import datetime
 from functools import wraps
 import uuid
+from config import CONFIGS
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Email configuration
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
-
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-# Initialize email service
-from email_service import init_mail
-init_mail(app)
+db = SQLAlchemy()
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'user_login'
+login_manager.login_view = 'main.user_login'
+
+main = Blueprint('main', __name__)
+
+from mail_queue import init_mail_queue, queue_email
+from catalog_cache import catalog_cache
+from pagination import page_args, keyset_page, next_page_url, first_page_url
+from query_counter import init_query_counter
+from query_plans import init_query_plans
+from dashboard_stats import get_dashboard_stats
+from db_pool import configure_engine, init_db_pool, pool_status
+from image_service import save_upload, rendition_urls, image_srcset, image_rendition
+from image_jobs import init_image_jobs, queue_renditions, image_status
+from upload_storage import init_upload_storage, release
+from cart_store import (add_to_cart, set_cart_quantity, remove_from_cart,
+                        add_to_wishlist, remove_from_wishlist, cart_items, wishlist_ids,
+                        validate_cart_operations, apply_cart_operations)
+from http_cache import init_http_cache, conditional
+from facets import (parse_selection, selection_key, facet_filters, facet_counts, facet_url,
+                    price_range_filters, without_args_url)
+from checkout import init_checkout, place_order, CheckoutError
+from reservations import init_reservations, reservation_owner, reserve, release as release_reservations
+from google_auth import init_google_auth
+from chunked_upload import chunked_upload
+from search import init_search, search_painting_ids
+
 
 # Database Models
 class Painting(db.Model):
@@ -53,9 +57,24 @@ class Painting(db.Model):
     medium = db.Column(db.String(100))
     year = db.Column(db.Integer)
     image_url = db.Column(db.String(500))
+    image_key = db.Column(db.String(64))
+    image_width = db.Column(db.Integer)
+    image_height = db.Column(db.Integer)
+    image_original = db.Column(db.String(500))
+    image_status = db.Column(db.String(20))  # processing, ready, failed
     available = db.Column(db.Boolean, default=True)
     featured = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Storefront pages: available paintings, newest first (keyset on created_at, id)
+        db.Index('ix_painting_available_created_at', 'created_at', 'id',
+                 postgresql_where=db.text('available'), sqlite_where=db.text('available = 1')),
+        db.Index('ix_painting_featured', 'created_at',
+                 postgresql_where=db.text('featured'), sqlite_where=db.text('featured = 1')),
+        db.Index('ix_painting_created_at_id', 'created_at', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -68,6 +87,10 @@ class Painting(db.Model):
             'medium': self.medium,
             'year': self.year,
             'image_url': self.image_url,
+            'image_key': self.image_key,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'images': rendition_urls(self.image_key),
             'available': self.available,
             'featured': self.featured
         }
@@ -79,7 +102,17 @@ class Exhibition(db.Model):
     date = db.Column(db.String(100))
     description = db.Column(db.Text)
     image_url = db.Column(db.String(500))
+    image_key = db.Column(db.String(64))
+    image_width = db.Column(db.Integer)
+    image_height = db.Column(db.Integer)
+    image_original = db.Column(db.String(500))
+    image_status = db.Column(db.String(20))  # processing, ready, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_exhibition_created_at_id', 'created_at', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -88,7 +121,11 @@ class Exhibition(db.Model):
             'venue': self.venue,
             'date': self.date,
             'description': self.description,
-            'image_url': self.image_url
+            'image_url': self.image_url,
+            'image_key': self.image_key,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'images': rendition_urls(self.image_key)
         }
 
 class Order(db.Model):
@@ -104,10 +141,15 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     order_items = db.relationship('OrderItem', backref='order', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),  # my_orders
+        db.Index('ix_order_created_at_id', 'created_at', 'id'),  # admin keyset pages
+    )
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     painting_id = db.Column(db.Integer, db.ForeignKey('painting.id'), nullable=False)
     quantity = db.Column(db.Integer, default=1)
     price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -122,6 +164,22 @@ class Contact(db.Model):
     message = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), default='new')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_contact_created_at_id', 'created_at', 'id'),
+    )
+
+class OutboundEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    ref_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    locked_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -145,6 +203,12 @@ class Cart(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     painting = db.relationship('Painting', backref='cart_items')
+    
+    # One row per painting per owner; guests have user_id NULL, users session_id NULL
+    __table_args__ = (
+        db.Index('uq_cart_user_id_painting_id', 'user_id', 'painting_id', unique=True),
+        db.Index('uq_cart_session_id_painting_id', 'session_id', 'painting_id', unique=True),
+    )
 
 class Wishlist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -154,6 +218,19 @@ class Wishlist(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     painting = db.relationship('Painting', backref='wishlist_items')
+    
+    __table_args__ = (
+        db.Index('uq_wishlist_user_id_painting_id', 'user_id', 'painting_id', unique=True),
+        db.Index('uq_wishlist_session_id_painting_id', 'session_id', 'painting_id', unique=True),
+    )
+
+class Reservation(db.Model):
+    """A short hold on a one-of-a-kind painting while its buyer checks out"""
+    id = db.Column(db.Integer, primary_key=True)
+    painting_id = db.Column(db.Integer, db.ForeignKey('painting.id'), nullable=False, unique=True)
+    owner = db.Column(db.String(120), nullable=False)  # 'user:<id>' or 'session:<id>'
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # reaper scans by expiry
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -164,6 +241,10 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.email}>'
 
+# Eager loading for views that render an order's items and their paintings
+def order_items_loader():
+    return selectinload(Order.order_items).joinedload(OrderItem.painting)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -208,52 +289,73 @@ def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'admin_id' not in session:
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('main.admin_login'))
         return f(*args, **kwargs)
     return decorated_function
 
+def get_cached_painting(id):
+    """Painting dict from the catalog cache, aborting with 404 if it doesn't exist"""
+    def load():
+        painting = Painting.query.get(id)
+        return painting.to_dict() if painting else None
+    painting = catalog_cache.get_painting(id, load)
+    if painting is None:
+        abort(404)
+    return painting
+
 # Routes
-@app.route('/')
+@main.route('/')
+@conditional('paintings', per_user=True)
 def home():
-    featured_paintings = Painting.query.filter_by(featured=True).limit(6).all()
+    featured_paintings = catalog_cache.get_list('featured', lambda: [
+        painting.to_dict() for painting in Painting.query.filter_by(featured=True).limit(6).all()
+    ])
     return render_template('index.html', paintings=featured_paintings)
 
-@app.route('/about')
+@main.route('/about')
 def about():
     return render_template('about.html')
 
-@app.route('/gallery')
+@main.route('/gallery')
+@conditional('exhibitions', per_user=True)
 def gallery():
-    exhibitions = Exhibition.query.order_by(Exhibition.created_at.desc()).all()
-    return render_template('gallery.html', exhibitions=exhibitions)
+    cursor, limit = page_args()
+    exhibitions, next_cursor = keyset_page(Exhibition.query, Exhibition, cursor, limit)
+    return render_template('gallery.html', exhibitions=exhibitions, next_cursor=next_cursor)
 
-@app.route('/paintings')
+@main.route('/paintings')
+@conditional('paintings', per_user=True)
 def paintings():
-    category = request.args.get('category', '')
+    q = request.args.get('q', '').strip()[:200]
+    selection = parse_selection(request.args)
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
+    cursor, limit = page_args()
     
-    query = Painting.query.filter_by(available=True)
-    
-    if category:
-        query = query.filter_by(category=category)
-    if min_price is not None:
-        query = query.filter(Painting.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Painting.price <= max_price)
-    
-    paintings = query.order_by(Painting.created_at.desc()).all()
-    categories = db.session.query(Painting.category).distinct().all()
-    categories = [cat[0] for cat in categories]
-    
-    return render_template('paintings.html', paintings=paintings, categories=categories)
-
-@app.route('/painting/<int:id>')
+    def load_paintings():
+        filters = facet_filters(selection) + price_range_filters(min_price, max_price)
+        
+        if q:
+            return search_paintings(q, cursor, limit, filters)
+        query = Painting.query.filter_by(available=True).filter(*filters)
+        items, next_cursor = keyset_page(query, Painting, cursor, limit)
+        return {'items': [painting.to_dict() for painting in items], 'next_cursor': next_cursor}
+    
+    page = catalog_cache.get_list('paintings', load_paintings, q=q, facets=selection_key(selection),
+                                  min_price=min_price, max_price=max_price,
+                                  cursor=cursor, limit=limit)
+    
+    facets = facet_counts(selection, q, min_price, max_price)
+    return render_template('paintings.html', paintings=page['items'], facets=facets,
+                           next_cursor=page['next_cursor'])
+
+@main.route('/painting/<int:id>')
+@conditional('paintings', per_user=True)
 def painting_detail(id):
-    painting = Painting.query.get_or_404(id)
+    painting = get_cached_painting(id)
     return render_template('painting_detail.html', painting=painting)
 
-@app.route('/contact', methods=['GET', 'POST'])
+@main.route('/contact', methods=['GET', 'POST'])
 def contact():
     form = ContactForm()
     if form.validate_on_submit():
@@ -264,174 +366,209 @@ def contact():
             message=form.message.data
         )
         db.session.add(contact)
-        db.session.commit()
+        db.session.flush()
         
-        # Send email notifications
-        from email_service import send_contact_notification, send_contact_confirmation
-        send_contact_notification(contact)
-        send_contact_confirmation(contact)
+        # Queue email notifications; the mail workers send them after commit
+        queue_email('contact_notification', contact.id)
+        queue_email('contact_confirmation', contact.id)
+        db.session.commit()
         
         flash('Thank you for your message! We will get back to you soon.', 'success')
-        return redirect(url_for('contact'))
+        return redirect(url_for('main.contact'))
     return render_template('contact.html', form=form)
 
 # API Routes
-@app.route('/api/paintings')
+def get_cached_paintings(ids):
+    """Painting dicts for ids from the catalog cache, loading misses with one IN query"""
+    return catalog_cache.get_paintings(ids, lambda missing: [
+        painting.to_dict() for painting in Painting.query.filter(Painting.id.in_(missing)).all()
+    ])
+
+def search_paintings(q, cursor, limit, filters=()):
+    """Ranked page of paintings matching q, each with a highlighted 'snippet'"""
+    hits, next_cursor = search_painting_ids(q, cursor, limit, filters)
+    found = get_cached_paintings([painting_id for painting_id, _ in hits])
+    items = [dict(found[painting_id], snippet=snippet)
+             for painting_id, snippet in hits if painting_id in found]
+    return {'items': items, 'next_cursor': next_cursor}
+
+def parse_painting_ids():
+    """Painting ids from ?ids=1,2,3 or a JSON body {"ids": [...]}, de-duplicated in order"""
+    if request.method == 'POST':
+        raw = (request.get_json(silent=True) or {}).get('ids', [])
+    else:
+        raw = request.args.get('ids', '').split(',')
+    ids = []
+    for value in raw:
+        try:
+            painting_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if painting_id not in ids:
+            ids.append(painting_id)
+    return ids
+
+@main.route('/api/paintings', methods=['GET', 'POST'])
+@conditional('paintings')
 def api_paintings():
-    paintings = Painting.query.filter_by(available=True).all()
-    return jsonify([painting.to_dict() for painting in paintings])
-
-@app.route('/api/paintings/<int:id>')
+    if request.method == 'POST' or 'ids' in request.args:
+        # Batch lookup of specific paintings
+        ids = parse_painting_ids()
+        if len(ids) > current_app.config['MAX_PAGE_SIZE']:
+            return jsonify({'success': False,
+                            'message': f"At most {current_app.config['MAX_PAGE_SIZE']} ids per request"}), 400
+        found = get_cached_paintings(ids)
+        return jsonify({
+            'paintings': [found[painting_id] for painting_id in ids if painting_id in found],
+            'missing': [painting_id for painting_id in ids if painting_id not in found]
+        })
+    
+    q = request.args.get('q', '').strip()[:200]
+    selection = parse_selection(request.args)
+    cursor, limit = page_args()
+    
+    def load_paintings():
+        filters = facet_filters(selection)
+        if q:
+            page = search_paintings(q, cursor, limit, filters)
+            return {'paintings': page['items'], 'next_cursor': page['next_cursor']}
+        query = Painting.query.filter_by(available=True).filter(*filters)
+        items, next_cursor = keyset_page(query, Painting, cursor, limit)
+        return {'paintings': [painting.to_dict() for painting in items], 'next_cursor': next_cursor}
+    
+    return jsonify(catalog_cache.get_list('api_paintings', load_paintings, q=q, facets=selection_key(selection),
+                                          cursor=cursor, limit=limit))
+
+@main.route('/api/paintings/facets')
+@conditional('paintings')
+def api_painting_facets():
+    return jsonify(facet_counts(parse_selection(request.args), request.args.get('q', '').strip()[:200],
+                                request.args.get('min_price', type=float),
+                                request.args.get('max_price', type=float)))
+
+@main.route('/api/paintings/<int:id>')
+@conditional('paintings')
 def api_painting(id):
-    painting = Painting.query.get_or_404(id)
-    return jsonify(painting.to_dict())
+    return jsonify(get_cached_painting(id))
 
-@app.route('/api/cart', methods=['GET', 'POST', 'DELETE'])
-def api_cart():
-    # Determine identifier: user_id if logged in, otherwise session_id
+def cart_owner(create=True):
+    """(user_id, session_id) owning the cart and wishlist: the user if logged in, otherwise the session.
+
+    With create=False a guest without a session gets (None, None) instead of a new session.
+    """
     if current_user.is_authenticated:
-        user_id = current_user.id
-        session_id = None
-    else:
-        user_id = None
-        if 'session_id' not in session:
-            session['session_id'] = str(uuid.uuid4())
-        session_id = session['session_id']
+        return current_user.id, None
+    if 'session_id' not in session:
+        if not create:
+            return None, None
+        session['session_id'] = str(uuid.uuid4())
+    return None, session['session_id']
+
+@main.route('/api/cart', methods=['GET', 'POST', 'DELETE'])
+def api_cart():
+    user_id, session_id = cart_owner()
     
     if request.method == 'GET':
-        # Get cart items
-        if user_id:
-            cart_items = Cart.query.filter_by(user_id=user_id).all()
-        else:
-            cart_items = Cart.query.filter_by(session_id=session_id).all()
-        
-        items = []
-        for item in cart_items:
-            if item.painting:
-                items.append({
-                    'id': item.painting.id,
-                    'title': item.painting.title,
-                    'price': float(item.painting.price),
-                    'imageUrl': item.painting.image_url,
-                    'quantity': item.quantity
-                })
-        return jsonify(items)
+        return jsonify(cart_items(user_id, session_id))
     
     elif request.method == 'POST':
-        # Add to cart
-        data = request.get_json()
+        # Add to cart: one upsert, safe against concurrent double-clicks
+        data = request.get_json(silent=True) or {}
         painting_id = data.get('painting_id')
         quantity = data.get('quantity', 1)
+        if not isinstance(painting_id, int) or not isinstance(quantity, int) or quantity < 1:
+            return jsonify({'success': False, 'message': 'Invalid painting or quantity'}), 400
         
-        painting = Painting.query.get_or_404(painting_id)
-        
-        # Check if already in cart
-        if user_id:
-            cart_item = Cart.query.filter_by(user_id=user_id, painting_id=painting_id).first()
-        else:
-            cart_item = Cart.query.filter_by(session_id=session_id, painting_id=painting_id).first()
-        
-        if cart_item:
-            cart_item.quantity += quantity
-        else:
-            cart_item = Cart(user_id=user_id, session_id=session_id, painting_id=painting_id, quantity=quantity)
-            db.session.add(cart_item)
-        
-        db.session.commit()
+        new_quantity = add_to_cart(user_id, session_id, painting_id, quantity)
+        if new_quantity is None:
+            abort(404)
         
         return jsonify({
             'success': True,
             'message': 'Added to cart',
-            'painting': painting.to_dict()
+            'quantity': new_quantity,
+            'painting': get_cached_painting(painting_id)
         })
     
     elif request.method == 'DELETE':
-        # Remove from cart
-        painting_id = request.args.get('painting_id', type=int)
-        if painting_id:
-            if user_id:
-                Cart.query.filter_by(user_id=user_id, painting_id=painting_id).delete()
-            else:
-                Cart.query.filter_by(session_id=session_id, painting_id=painting_id).delete()
-        else:
-            # Clear entire cart
-            if user_id:
-                Cart.query.filter_by(user_id=user_id).delete()
-            else:
-                Cart.query.filter_by(session_id=session_id).delete()
-        db.session.commit()
+        # Remove one painting, or clear the entire cart
+        remove_from_cart(user_id, session_id, request.args.get('painting_id', type=int))
         return jsonify({'success': True})
 
-@app.route('/api/cart/update', methods=['POST'])
+@main.route('/api/cart/update', methods=['POST'])
 def update_cart():
-    # Determine identifier
-    if current_user.is_authenticated:
-        user_id = current_user.id
-        session_id = None
-    else:
-        if 'session_id' not in session:
-            return jsonify({'success': False, 'message': 'No session'})
-        user_id = None
-        session_id = session['session_id']
+    user_id, session_id = cart_owner(create=False)
+    if not (user_id or session_id):
+        return jsonify({'success': False, 'message': 'No session'})
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     painting_id = data.get('painting_id')
     quantity = data.get('quantity', 1)
+    if not isinstance(quantity, int):
+        return jsonify({'success': False, 'message': 'Invalid quantity'}), 400
     
-    if user_id:
-        cart_item = Cart.query.filter_by(user_id=user_id, painting_id=painting_id).first()
-    else:
-        cart_item = Cart.query.filter_by(session_id=session_id, painting_id=painting_id).first()
-    
-    if cart_item:
-        if quantity > 0:
-            cart_item.quantity = quantity
-        else:
-            db.session.delete(cart_item)
-        db.session.commit()
+    if set_cart_quantity(user_id, session_id, painting_id, quantity):
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'message': 'Item not found'})
 
-@app.route('/api/wishlist', methods=['GET', 'POST', 'DELETE'])
+@main.route('/api/cart/batch', methods=['POST'])
+def api_cart_batch():
+    """Apply a list of add/set/remove/clear operations in one transaction.
+
+    Lets the storefront debounce quantity edits into a single request; responds
+    with one result per operation and the resulting cart.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    error = validate_cart_operations(operations, current_app.config['MAX_PAGE_SIZE'])
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    
+    user_id, session_id = cart_owner()
+    results = apply_cart_operations(user_id, session_id, operations)
+    return jsonify({
+        'success': True,
+        'results': results,
+        'cart': cart_items(user_id, session_id)
+    })
+
+@main.route('/api/session-state')
+def api_session_state():
+    """Cart and wishlist together, so a page load syncs with one request"""
+    user_id, session_id = cart_owner(create=False)
+    if not (user_id or session_id):
+        return jsonify({'cart': [], 'wishlist': []})
+    return jsonify({
+        'cart': cart_items(user_id, session_id),
+        'wishlist': wishlist_ids(user_id, session_id)
+    })
+
+@main.route('/api/wishlist', methods=['GET', 'POST', 'DELETE'])
 def api_wishlist():
-    # Determine identifier: user_id if logged in, otherwise session_id
-    if current_user.is_authenticated:
-        user_id = current_user.id
-        session_id = None
-    else:
-        user_id = None
-        if 'session_id' not in session:
-            session['session_id'] = str(uuid.uuid4())
-        session_id = session['session_id']
+    user_id, session_id = cart_owner()
     
     if request.method == 'GET':
         # Get wishlist items
         if user_id:
-            wishlist_items = Wishlist.query.filter_by(user_id=user_id).all()
+            wishlist_items = Wishlist.query.options(joinedload(Wishlist.painting)).filter_by(user_id=user_id).all()
         else:
-            wishlist_items = Wishlist.query.filter_by(session_id=session_id).all()
+            wishlist_items = Wishlist.query.options(joinedload(Wishlist.painting)).filter_by(session_id=session_id).all()
         
+        if request.args.get('embed') == 'paintings':
+            return jsonify([item.painting.to_dict() for item in wishlist_items if item.painting])
         items = [item.painting_id for item in wishlist_items if item.painting]
         return jsonify(items)
     
     elif request.method == 'POST':
-        # Add to wishlist
-        data = request.get_json()
+        # Add to wishlist (idempotent upsert)
+        data = request.get_json(silent=True) or {}
         painting_id = data.get('painting_id')
+        if not isinstance(painting_id, int):
+            return jsonify({'success': False, 'message': 'Invalid painting'}), 400
         
-        painting = Painting.query.get_or_404(painting_id)
-        
-        # Check if already in wishlist
-        if user_id:
-            wishlist_item = Wishlist.query.filter_by(user_id=user_id, painting_id=painting_id).first()
-        else:
-            wishlist_item = Wishlist.query.filter_by(session_id=session_id, painting_id=painting_id).first()
-        
-        if not wishlist_item:
-            wishlist_item = Wishlist(user_id=user_id, session_id=session_id, painting_id=painting_id)
-            db.session.add(wishlist_item)
-            db.session.commit()
+        if not add_to_wishlist(user_id, session_id, painting_id):
+            abort(404)
         
         return jsonify({
             'success': True,
@@ -442,117 +579,120 @@ def api_wishlist():
         # Remove from wishlist
         painting_id = request.args.get('painting_id', type=int)
         if painting_id:
-            if user_id:
-                Wishlist.query.filter_by(user_id=user_id, painting_id=painting_id).delete()
-            else:
-                Wishlist.query.filter_by(session_id=session_id, painting_id=painting_id).delete()
-            db.session.commit()
+            remove_from_wishlist(user_id, session_id, painting_id)
         return jsonify({'success': True})
 
-@app.route('/cart')
+@main.route('/cart')
 def cart():
     # Sync localStorage to database on page load
     return render_template('cart.html')
 
-@app.route('/wishlist')
+@main.route('/wishlist')
 def wishlist():
-    return render_template('wishlist.html')
-
-@app.route('/checkout', methods=['GET', 'POST'])
+    return render_template('wishlist.html', batch_size=current_app.config['MAX_PAGE_SIZE'])
+
+@main.route('/api/checkout/hold', methods=['POST', 'DELETE'])
+def api_checkout_hold():
+    """Hold the cart's paintings for RESERVATION_TTL seconds while the buyer fills in checkout"""
+    owner = reservation_owner(*cart_owner())
+    if request.method == 'DELETE':
+        release_reservations(owner)
+        db.session.commit()
+        return jsonify({'success': True})
+    
+    data = request.get_json(silent=True) or {}
+    painting_ids = data.get('painting_ids')
+    if (not isinstance(painting_ids, list) or len(painting_ids) > current_app.config['CHECKOUT_MAX_ITEMS']
+            or not all(isinstance(painting_id, int) for painting_id in painting_ids)):
+        return jsonify({'success': False, 'message': 'Invalid painting ids'}), 400
+    
+    held = reserve(owner, set(painting_ids))
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'held': sorted(held),
+        'unavailable': sorted(set(painting_ids) - held),
+        'expires_in': current_app.config['RESERVATION_TTL']
+    })
+
+@main.route('/checkout', methods=['GET', 'POST'])
 def checkout():
     if request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         
-        # Create order
-        order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        order = Order(
-            order_number=order_number,
-            user_id=current_user.id if current_user.is_authenticated else None,
-            customer_name=data.get('name'),
-            customer_email=data.get('email'),
-            customer_phone=data.get('phone'),
-            shipping_address=data.get('address'),
-            total_amount=data.get('total'),
-            status='pending'
-        )
-        db.session.add(order)
-        db.session.flush()
-        
-        # Create order items
-        for item in data.get('items', []):
-            order_item = OrderItem(
-                order_id=order.id,
-                painting_id=item['id'],
-                quantity=item['quantity'],
-                price=item['price']
+        # Prices, availability and the total come from the catalog, not the client
+        try:
+            order_id, order_number, total = place_order(
+                {key: data.get(key) for key in ('name', 'email', 'phone', 'address')},
+                data.get('items'),
+                user_id=current_user.id if current_user.is_authenticated else None,
+                owner=reservation_owner(*cart_owner())
             )
-            db.session.add(order_item)
+        except CheckoutError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
         
+        # Queue email notifications; the mail workers send them after commit
+        queue_email('order_confirmation', order_id)
+        queue_email('order_admin_notification', order_id)
         db.session.commit()
         
-        # Send email notifications
-        from email_service import send_order_confirmation, send_order_notification_to_admin
-        send_order_confirmation(order, order.customer_email)
-        send_order_notification_to_admin(order)
-        
         return jsonify({
             'success': True,
             'order_number': order_number,
+            'total': float(total),
             'message': 'Order placed successfully!'
         })
     
     return render_template('checkout.html')
 
 # Admin Routes
-@app.route('/admin/login', methods=['GET', 'POST'])
+@main.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     form = LoginForm()
     if form.validate_on_submit():
         admin = Admin.query.filter_by(username=form.username.data).first()
         if admin and admin.check_password(form.password.data):
             session['admin_id'] = admin.id
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('main.admin_dashboard'))
         flash('Invalid username or password', 'error')
     return render_template('admin/login.html', form=form)
 
-@app.route('/admin/logout')
+@main.route('/admin/logout')
 def admin_logout():
     session.pop('admin_id', None)
-    return redirect(url_for('admin_login'))
+    return redirect(url_for('main.admin_login'))
 
-@app.route('/admin')
+@main.route('/admin')
 @admin_required
 def admin_dashboard():
-    paintings_count = Painting.query.count()
-    orders_count = Order.query.count()
-    exhibitions_count = Exhibition.query.count()
-    contacts_count = Contact.query.filter_by(status='new').count()
+    stats = get_dashboard_stats(ttl=current_app.config['DASHBOARD_CACHE_TTL'])
     
     recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
-                         paintings_count=paintings_count,
-                         orders_count=orders_count,
-                         exhibitions_count=exhibitions_count,
-                         contacts_count=contacts_count,
+                         paintings_count=stats['paintings_count'],
+                         orders_count=stats['orders_count'],
+                         exhibitions_count=stats['exhibitions_count'],
+                         contacts_count=stats['contacts_count'],
+                         revenue_by_day=stats['revenue_by_day'],
                          recent_orders=recent_orders)
 
-@app.route('/admin/paintings')
+@main.route('/admin/paintings')
 @admin_required
 def admin_paintings():
-    paintings = Painting.query.order_by(Painting.created_at.desc()).all()
-    return render_template('admin/paintings.html', paintings=paintings)
+    cursor, limit = page_args(current_app.config['ADMIN_PAGE_SIZE'])
+    paintings, next_cursor = keyset_page(Painting.query, Painting, cursor, limit)
+    return render_template('admin/paintings.html', paintings=paintings, next_cursor=next_cursor)
 
-@app.route('/admin/paintings/add', methods=['GET', 'POST'])
+@main.route('/admin/paintings/add', methods=['GET', 'POST'])
 @admin_required
 def admin_add_painting():
     form = PaintingForm()
     if form.validate_on_submit():
-        filename = None
+        image_fields = {}
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            filename = f"{uuid.uuid4()}_{filename}"
-            form.image.data.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            image_fields = save_upload(form.image.data, current_app.config['UPLOAD_FOLDER'])
         
         painting = Painting(
             title=form.title.data,
@@ -562,17 +702,20 @@ def admin_add_painting():
             size=form.size.data,
             medium=form.medium.data,
             year=form.year.data,
-            image_url=f"/static/uploads/{filename}" if filename else None,
-            featured=bool(form.featured.data)
+            featured=bool(form.featured.data),
+            **image_fields
         )
         db.session.add(painting)
         db.session.commit()
+        catalog_cache.invalidate_painting(painting.id)
+        if image_fields:
+            queue_renditions('painting', painting)
         flash('Painting added successfully!', 'success')
-        return redirect(url_for('admin_paintings'))
+        return redirect(url_for('main.admin_paintings'))
     
     return render_template('admin/add_painting.html', form=form)
 
-@app.route('/admin/paintings/edit/<int:id>', methods=['GET', 'POST'])
+@main.route('/admin/paintings/edit/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_painting(id):
     painting = Painting.query.get_or_404(id)
@@ -588,59 +731,68 @@ def admin_edit_painting(id):
         painting.year = form.year.data
         painting.featured = bool(form.featured.data)
         
+        old_original = painting.image_original
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            filename = f"{uuid.uuid4()}_{filename}"
-            form.image.data.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            painting.image_url = f"/static/uploads/{filename}"
+            for field, value in save_upload(form.image.data, current_app.config['UPLOAD_FOLDER']).items():
+                setattr(painting, field, value)
         
         db.session.commit()
+        if painting.image_original != old_original:
+            release(old_original)
+        catalog_cache.invalidate_painting(painting.id)
+        if form.image.data:
+            queue_renditions('painting', painting)
         flash('Painting updated successfully!', 'success')
-        return redirect(url_for('admin_paintings'))
+        return redirect(url_for('main.admin_paintings'))
     
     return render_template('admin/edit_painting.html', form=form, painting=painting)
 
-@app.route('/admin/paintings/delete/<int:id>')
+@main.route('/admin/paintings/delete/<int:id>')
 @admin_required
 def admin_delete_painting(id):
     painting = Painting.query.get_or_404(id)
+    image_original = painting.image_original
     db.session.delete(painting)
     db.session.commit()
+    catalog_cache.invalidate_painting(id)
+    release(image_original)
     flash('Painting deleted successfully!', 'success')
-    return redirect(url_for('admin_paintings'))
+    return redirect(url_for('main.admin_paintings'))
 
-@app.route('/admin/exhibitions')
+@main.route('/admin/exhibitions')
 @admin_required
 def admin_exhibitions():
-    exhibitions = Exhibition.query.order_by(Exhibition.created_at.desc()).all()
-    return render_template('admin/exhibitions.html', exhibitions=exhibitions)
+    cursor, limit = page_args(current_app.config['ADMIN_PAGE_SIZE'])
+    exhibitions, next_cursor = keyset_page(Exhibition.query, Exhibition, cursor, limit)
+    return render_template('admin/exhibitions.html', exhibitions=exhibitions, next_cursor=next_cursor)
 
-@app.route('/admin/exhibitions/add', methods=['GET', 'POST'])
+@main.route('/admin/exhibitions/add', methods=['GET', 'POST'])
 @admin_required
 def admin_add_exhibition():
     form = ExhibitionForm()
     if form.validate_on_submit():
-        filename = None
+        image_fields = {}
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            filename = f"{uuid.uuid4()}_{filename}"
-            form.image.data.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            image_fields = save_upload(form.image.data, current_app.config['UPLOAD_FOLDER'])
         
         exhibition = Exhibition(
             title=form.title.data,
             venue=form.venue.data,
             date=form.date.data,
             description=form.description.data,
-            image_url=f"/static/uploads/{filename}" if filename else None
+            **image_fields
         )
         db.session.add(exhibition)
         db.session.commit()
+        catalog_cache.invalidate_exhibitions()
+        if image_fields:
+            queue_renditions('exhibition', exhibition)
         flash('Exhibition added successfully!', 'success')
-        return redirect(url_for('admin_exhibitions'))
+        return redirect(url_for('main.admin_exhibitions'))
     
     return render_template('admin/add_exhibition.html', form=form)
 
-@app.route('/admin/exhibitions/edit/<int:id>', methods=['GET', 'POST'])
+@main.route('/admin/exhibitions/edit/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_exhibition(id):
     exhibition = Exhibition.query.get_or_404(id)
@@ -652,59 +804,147 @@ def admin_edit_exhibition(id):
         exhibition.date = form.date.data
         exhibition.description = form.description.data
         
+        old_original = exhibition.image_original
         if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            filename = f"{uuid.uuid4()}_{filename}"
-            form.image.data.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            exhibition.image_url = f"/static/uploads/{filename}"
+            for field, value in save_upload(form.image.data, current_app.config['UPLOAD_FOLDER']).items():
+                setattr(exhibition, field, value)
         
         db.session.commit()
+        catalog_cache.invalidate_exhibitions()
+        if exhibition.image_original != old_original:
+            release(old_original)
+        if form.image.data:
+            queue_renditions('exhibition', exhibition)
         flash('Exhibition updated successfully!', 'success')
-        return redirect(url_for('admin_exhibitions'))
+        return redirect(url_for('main.admin_exhibitions'))
     
     return render_template('admin/edit_exhibition.html', form=form, exhibition=exhibition)
 
-@app.route('/admin/exhibitions/delete/<int:id>')
+@main.route('/admin/exhibitions/delete/<int:id>')
 @admin_required
 def admin_delete_exhibition(id):
     exhibition = Exhibition.query.get_or_404(id)
+    image_original = exhibition.image_original
     db.session.delete(exhibition)
     db.session.commit()
+    catalog_cache.invalidate_exhibitions()
+    release(image_original)
     flash('Exhibition deleted successfully!', 'success')
-    return redirect(url_for('admin_exhibitions'))
+    return redirect(url_for('main.admin_exhibitions'))
 
-@app.route('/admin/orders')
+@main.route('/admin/images/<kind>/<int:id>/status')
+@admin_required
+def admin_image_status(kind, id):
+    if kind not in ('painting', 'exhibition'):
+        abort(404)
+    status = image_status(kind, id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+@main.route('/admin/db-pool')
+@admin_required
+def admin_db_pool():
+    return jsonify(pool_status(db.engine))
+
+@main.route('/admin/orders')
 @admin_required
 def admin_orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template('admin/orders.html', orders=orders)
+    cursor, limit = page_args(current_app.config['ADMIN_PAGE_SIZE'])
+    orders, next_cursor = keyset_page(Order.query.options(order_items_loader()), Order, cursor, limit)
+    return render_template('admin/orders.html', orders=orders, next_cursor=next_cursor)
 
-@app.route('/admin/contacts')
+@main.route('/admin/contacts')
 @admin_required
 def admin_contacts():
-    contacts = Contact.query.order_by(Contact.created_at.desc()).all()
-    return render_template('admin/contacts.html', contacts=contacts)
+    cursor, limit = page_args(current_app.config['ADMIN_PAGE_SIZE'])
+    contacts, next_cursor = keyset_page(Contact.query, Contact, cursor, limit)
+    return render_template('admin/contacts.html', contacts=contacts, next_cursor=next_cursor)
 
-@app.route('/login')
+@main.route('/login')
 def user_login():
     return render_template('user_login.html')
 
-@app.route('/my-orders')
+@main.route('/my-orders')
 @login_required
 def my_orders():
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+    orders = Order.query.options(order_items_loader()).filter_by(
+        user_id=current_user.id).order_by(Order.created_at.desc()).all()
     return render_template('my_orders.html', orders=orders)
 
-@app.route('/order/<order_number>')
+@main.route('/order/<order_number>')
 @login_required
 def order_detail(order_number):
-    order = Order.query.filter_by(order_number=order_number, user_id=current_user.id).first_or_404()
+    order = Order.query.options(order_items_loader()).filter_by(
+        order_number=order_number, user_id=current_user.id).first_or_404()
     return render_template('order_detail.html', order=order)
 
-from google_auth import google_auth
-app.register_blueprint(google_auth)
+def create_app(config=None):
+    """Build and configure an application.
+
+    config is a profile name from config.CONFIGS, a config class, or a dict of
+    overrides on top of the APP_CONFIG profile. Mail, Google sign-in, image
+    processing and Flask-Migrate set themselves up on first use.
+    """
+    app = Flask(__name__)
+    if config is None or isinstance(config, dict):
+        app.config.from_object(CONFIGS[os.getenv('APP_CONFIG', 'default')])
+        app.config.update(config or {})
+    else:
+        app.config.from_object(CONFIGS[config] if isinstance(config, str) else config)
+
+    configure_engine(app)
+    db.init_app(app)
+    init_db_pool(app)
+    init_migrate(app)
+    login_manager.init_app(app)
+
+    init_mail_queue(app)
+    catalog_cache.init_app(app)
+    app.jinja_env.globals.update(next_page_url=next_page_url, first_page_url=first_page_url)
+    init_query_counter(app)
+    init_query_plans(app)
+    app.jinja_env.globals.update(image_srcset=image_srcset, image_rendition=image_rendition)
+    init_image_jobs(app)
+    init_upload_storage(app)
+    init_http_cache(app)
+    app.jinja_env.globals.update(facet_url=facet_url, without_args_url=without_args_url)
+    init_checkout(app)
+    init_reservations(app)
+
+    app.register_blueprint(main)
+    init_google_auth(app)
+    app.register_blueprint(chunked_upload)
+    init_search(app)
+    return app
+
+
+def init_migrate(app):
+    """Register `flask db`; web workers skip importing Flask-Migrate and alembic"""
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # The module-level `app` (flask CLI, gunicorn, run.py) is built on first
+    # access, so modules that only import models don't build an application
+    global app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if 'app' not in globals():
+            app = create_app()
+    return app
 
 if __name__ == '__main__':
+    # Import the 'app' module rather than using __main__'s copies, so the
+    # models and db here are the ones the other modules import
+    from app import create_app, db, Admin
+    app = create_app()
     with app.app_context():
         db.create_all()
         # Create default admin user if it doesn't exist
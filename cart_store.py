@@ -0,0 +1,190 @@
+"""
+Cart and wishlist mutations as single atomic statements (INSERT ... ON CONFLICT upserts)
+
+Rows belong to a user or, for guests, a session; the unique (user_id,
+painting_id) and (session_id, painting_id) indexes are the conflict targets.
+Works on PostgreSQL and SQLite (3.35+ for RETURNING).
+"""
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, case, cast, delete, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+
+
+def _insert(model):
+    from app import db
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
+
+
+def _owner_column(user_id):
+    return 'user_id' if user_id else 'session_id'
+
+
+def _owned_by(model, user_id, session_id):
+    return model.user_id == user_id if user_id else model.session_id == session_id
+
+
+def _owner_row(user_id, session_id, painting_id):
+    """SELECT of (user_id, session_id, painting_id, created_at) yielding a row only if the painting exists"""
+    from app import Painting
+    return select(
+        cast(literal(user_id), Integer),
+        cast(literal(session_id), String),
+        Painting.id,
+        literal(datetime.utcnow(), DateTime),  # no CAST: SQLite would give it numeric affinity
+    ).where(Painting.id == painting_id)
+
+
+CART_OPERATIONS = ('add', 'set', 'remove', 'clear')
+MAX_QUANTITY = 1  # every painting is one of a kind
+
+
+def _add(user_id, session_id, painting_id, quantity):
+    from app import db, Cart
+    quantity = min(quantity, MAX_QUANTITY)
+    row = _owner_row(user_id, session_id, painting_id).add_columns(cast(literal(quantity), Integer))
+    insert = _insert(Cart).from_select(['user_id', 'session_id', 'painting_id', 'created_at', 'quantity'], row)
+    statement = insert.on_conflict_do_update(
+        index_elements=[_owner_column(user_id), 'painting_id'],
+        set_={'quantity': case((Cart.quantity + insert.excluded.quantity > MAX_QUANTITY, MAX_QUANTITY),
+                               else_=Cart.quantity + insert.excluded.quantity)},
+    ).returning(Cart.quantity)
+    return db.session.execute(statement).scalar()
+
+
+def _set(user_id, session_id, painting_id, quantity):
+    from app import db, Cart
+    owned = [_owned_by(Cart, user_id, session_id), Cart.painting_id == painting_id]
+    if quantity > 0:
+        statement = update(Cart).where(*owned).values(quantity=min(quantity, MAX_QUANTITY)).returning(Cart.id)
+    else:
+        statement = delete(Cart).where(*owned).returning(Cart.id)
+    return db.session.execute(statement).first() is not None
+
+
+def _remove(user_id, session_id, painting_id=None):
+    from app import db, Cart
+    statement = delete(Cart).where(_owned_by(Cart, user_id, session_id))
+    if painting_id is not None:
+        statement = statement.where(Cart.painting_id == painting_id)
+    db.session.execute(statement)
+
+
+def _committed(apply, *args):
+    from app import db
+    try:
+        result = apply(*args)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+
+def add_to_cart(user_id, session_id, painting_id, quantity=1):
+    """Add quantity to the owner's cart line, creating it if needed; capped at MAX_QUANTITY.
+
+    Returns the line's new quantity, or None if the painting doesn't exist.
+    """
+    return _committed(_add, user_id, session_id, painting_id, quantity)
+
+
+def set_cart_quantity(user_id, session_id, painting_id, quantity):
+    """Set a cart line's quantity (capped at MAX_QUANTITY), deleting it when quantity <= 0.
+
+    Returns False if the owner has no such line.
+    """
+    return _committed(_set, user_id, session_id, painting_id, quantity)
+
+
+def remove_from_cart(user_id, session_id, painting_id=None):
+    """Delete one cart line, or the whole cart when painting_id is None"""
+    _committed(_remove, user_id, session_id, painting_id)
+
+
+def validate_cart_operations(operations, max_operations):
+    """Error message for a malformed batch of cart operations, or None if it is valid.
+
+    Each operation is {"op": "add"|"set"|"remove"|"clear", "painting_id": N, "quantity": N};
+    quantity is optional for add (default 1) and required for set.
+    """
+    if not isinstance(operations, list) or not operations:
+        return 'operations must be a non-empty list'
+    if len(operations) > max_operations:
+        return f'At most {max_operations} operations per request'
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in CART_OPERATIONS:
+            return f'operations[{index}]: op must be one of {", ".join(CART_OPERATIONS)}'
+        if operation['op'] != 'clear' and not isinstance(operation.get('painting_id'), int):
+            return f'operations[{index}]: painting_id must be an integer'
+        quantity = operation.get('quantity', 1 if operation['op'] == 'add' else None)
+        if operation['op'] in ('add', 'set') and not isinstance(quantity, int):
+            return f'operations[{index}]: quantity must be an integer'
+        if operation['op'] == 'add' and quantity < 1:
+            return f'operations[{index}]: quantity must be at least 1'
+    return None
+
+
+def apply_cart_operations(user_id, session_id, operations):
+    """Apply validated operations in order, in one transaction.
+
+    Returns one result per operation: False for an add of a missing painting
+    or a set of a line the owner doesn't have, True otherwise.
+    """
+    def apply():
+        results = []
+        for operation in operations:
+            kind, painting_id = operation['op'], operation.get('painting_id')
+            if kind == 'add':
+                results.append(_add(user_id, session_id, painting_id, operation.get('quantity', 1)) is not None)
+            elif kind == 'set':
+                results.append(_set(user_id, session_id, painting_id, operation['quantity']))
+            else:
+                _remove(user_id, session_id, painting_id if kind == 'remove' else None)
+                results.append(True)
+        return results
+    return _committed(apply)
+
+
+def cart_items(user_id, session_id):
+    """The owner's cart as the list of item dicts the storefront scripts keep in localStorage"""
+    from app import Cart
+    items = Cart.query.options(joinedload(Cart.painting)).filter(_owned_by(Cart, user_id, session_id)).all()
+    return [{
+        'id': item.painting.id,
+        'title': item.painting.title,
+        'price': float(item.painting.price),
+        'imageUrl': item.painting.image_url,
+        'quantity': min(item.quantity, MAX_QUANTITY)  # lines added before the cap
+    } for item in items if item.painting]
+
+
+def wishlist_ids(user_id, session_id):
+    from app import db, Wishlist
+    return db.session.execute(
+        select(Wishlist.painting_id).where(_owned_by(Wishlist, user_id, session_id)).order_by(Wishlist.id)
+    ).scalars().all()
+
+
+def add_to_wishlist(user_id, session_id, painting_id):
+    """Add a painting to the owner's wishlist; a repeat add is a no-op.
+
+    Returns False if the painting doesn't exist.
+    """
+    from app import db, Wishlist
+    insert = _insert(Wishlist).from_select(['user_id', 'session_id', 'painting_id', 'created_at'],
+                                           _owner_row(user_id, session_id, painting_id))
+    # DO UPDATE rather than DO NOTHING so RETURNING yields the existing row too
+    statement = insert.on_conflict_do_update(
+        index_elements=[_owner_column(user_id), 'painting_id'],
+        set_={'painting_id': insert.excluded.painting_id},
+    ).returning(Wishlist.id)
+    return _committed(lambda: db.session.execute(statement).first() is not None)
+
+
+def remove_from_wishlist(user_id, session_id, painting_id):
+    from app import db, Wishlist
+    _committed(db.session.execute, delete(Wishlist).where(
+        _owned_by(Wishlist, user_id, session_id), Wishlist.painting_id == painting_id
+    ))
@@ -0,0 +1,198 @@
+"""
+Read-through cache for catalog (Painting) queries
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import redis
+except ImportError:  # only needed for CATALOG_CACHE_BACKEND=redis
+    redis = None
+
+
+class LRUBackend:
+    """In-process LRU cache with per-entry TTL (one copy per worker)"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+
+class RedisBackend:
+    """Redis-backed cache shared by every worker process"""
+
+    GENERATION_KEY = 'catalog:generation'
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('CATALOG_CACHE_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def get_generation(self):
+        return int(self.client.get(self.GENERATION_KEY) or 0)
+
+    def bump_generation(self):
+        self.client.incr(self.GENERATION_KEY)
+
+
+class CatalogCache:
+    """Caches catalog query results as plain dicts.
+
+    Single paintings are keyed by id and invalidated individually. List
+    results are keyed by a generation number that every admin write bumps,
+    so all filter combinations are dropped at once.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+
+    def init_app(self, app):
+        kind = app.config.get('CATALOG_CACHE_BACKEND', 'lru')
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', self.ttl)
+        if kind == 'redis':
+            self.backend = RedisBackend(app.config['CATALOG_CACHE_REDIS_URL'])
+        elif kind == 'lru':
+            self.backend = LRUBackend(app.config.get('CATALOG_CACHE_SIZE', 512))
+        else:
+            self.backend = None
+
+    def _fetch(self, key, loader):
+        if self.backend is None:
+            return loader()
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Catalog cache read error: {e}")
+            return loader()
+        if value is None:
+            value = loader()
+            if value is not None:
+                try:
+                    self.backend.set(key, value, self.ttl)
+                except Exception as e:
+                    print(f"Catalog cache write error: {e}")
+        return value
+
+    def get_list(self, name, loader, **params):
+        """Return a cached list result for the given query name and filters"""
+        try:
+            generation = self.backend.get_generation() if self.backend else 0
+        except Exception as e:
+            print(f"Catalog cache read error: {e}")
+            return loader()
+        args = ','.join(f'{k}={params[k]}' for k in sorted(params))
+        return self._fetch(f'catalog:list:{generation}:{name}:{args}', loader)
+
+    def get_version(self, scope, loader):
+        """Return (row count, last modified) for 'paintings' or 'exhibitions'.
+
+        Cached under the list generation, so the loader's aggregate query only
+        runs again after an invalidation (or when the entry expires).
+        """
+        def load():
+            count, last_modified = loader()
+            return [count, last_modified.isoformat() if last_modified else None]
+        count, last_modified = self.get_list(f'version:{scope}', load)
+        return count, datetime.fromisoformat(last_modified) if last_modified else None
+
+    def get_painting(self, painting_id, loader):
+        """Return a cached painting dict, or None if the loader finds nothing"""
+        return self._fetch(f'catalog:painting:{painting_id}', loader)
+
+    def get_paintings(self, painting_ids, loader):
+        """Return {id: painting dict} for the ids found.
+
+        Cache misses are passed to loader(ids) together, which should
+        return a list of painting dicts.
+        """
+        found = {}
+        missing = []
+        for painting_id in painting_ids:
+            value = None
+            if self.backend is not None:
+                try:
+                    value = self.backend.get(f'catalog:painting:{painting_id}')
+                except Exception as e:
+                    print(f"Catalog cache read error: {e}")
+            if value is None:
+                missing.append(painting_id)
+            else:
+                found[painting_id] = value
+        if missing:
+            for painting in loader(missing):
+                found[painting['id']] = painting
+                if self.backend is not None:
+                    try:
+                        self.backend.set(f'catalog:painting:{painting["id"]}', painting, self.ttl)
+                    except Exception as e:
+                        print(f"Catalog cache write error: {e}")
+        return found
+
+    def invalidate_painting(self, painting_id=None):
+        """Drop a painting (if given) and every cached list"""
+        if self.backend is None:
+            return
+        try:
+            if painting_id is not None:
+                self.backend.delete(f'catalog:painting:{painting_id}')
+            self.backend.bump_generation()
+        except Exception as e:
+            print(f"Catalog cache invalidation error: {e}")
+
+    def invalidate_exhibitions(self):
+        """Drop every cached list, including the exhibitions' catalog version"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.bump_generation()
+        except Exception as e:
+            print(f"Catalog cache invalidation error: {e}")
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,132 @@
+"""
+Checkout engine: prices and availability come from the database, never the client
+
+An order costs a fixed number of statements whatever the cart size: one
+SELECT ... WHERE id IN (...) for the paintings, one upsert claiming their
+reservations, one INSERT ... RETURNING for the order, one multi-row INSERT
+for its items, then one UPDATE marking the paintings sold and one DELETE of
+their holds.
+"""
+import time
+import uuid
+from decimal import Decimal
+import click
+from sqlalchemy import insert, select
+
+
+class CheckoutError(ValueError):
+    """The cart can't be ordered as submitted; the message is safe to show the customer"""
+
+
+def _cart_lines(items, max_items):
+    """{painting_id: quantity} from the client's cart items, merging repeated paintings"""
+    if not isinstance(items, list) or not items:
+        raise CheckoutError('Your cart is empty')
+    if len(items) > max_items:
+        raise CheckoutError(f'At most {max_items} items per order')
+    lines = {}
+    for item in items:
+        painting_id = item.get('id') if isinstance(item, dict) else None
+        quantity = item.get('quantity', 1) if isinstance(item, dict) else None
+        if not isinstance(painting_id, int) or not isinstance(quantity, int) or quantity < 1:
+            raise CheckoutError('Invalid cart item')
+        lines[painting_id] = lines.get(painting_id, 0) + quantity
+    return lines
+
+
+def resolve_paintings(lines):
+    """{painting_id: (title, price)} for every line, from one IN query; raises CheckoutError
+    naming any painting that no longer exists or is no longer available"""
+    from app import db, Painting
+    rows = db.session.execute(
+        select(Painting.id, Painting.title, Painting.price, Painting.available)
+        .where(Painting.id.in_(list(lines)))
+    ).all()
+    found = {row.id: row for row in rows}
+    missing = [painting_id for painting_id in lines if painting_id not in found]
+    if missing:
+        raise CheckoutError(f'Paintings no longer in the catalog: {", ".join(map(str, missing))}')
+    unavailable = [row.title for row in rows if not row.available]
+    if unavailable:
+        raise CheckoutError(f'No longer available: {", ".join(unavailable)}')
+    return {row.id: (row.title, Decimal(row.price)) for row in rows}
+
+
+def place_order(customer, items, user_id=None, owner=None):
+    """Insert an order for the cart items in the current transaction; the caller commits.
+
+    customer holds name, email, phone and address; owner is the buyer's
+    reservation key (see reservations.reservation_owner), and any live holds
+    it has are honoured. Every painting is one of a kind, so each line is
+    ordered once whatever quantity a stale cart still carries. The paintings
+    are marked sold with the order.
+    Returns (order_id, order_number, total) with the total computed from
+    catalog prices.
+    """
+    from flask import current_app
+    from app import db, Order, OrderItem
+    from reservations import reserve, sell
+    if not customer.get('name') or not customer.get('email'):
+        raise CheckoutError('Name and email are required')
+    lines = _cart_lines(items, current_app.config['CHECKOUT_MAX_ITEMS'])
+    paintings = resolve_paintings(lines)
+
+    owner = owner or f'order:{uuid.uuid4().hex}'
+    taken = [paintings[painting_id][0] for painting_id in set(lines) - reserve(owner, lines)]
+    if taken:
+        raise CheckoutError(f'Just sold or reserved by another buyer: {", ".join(taken)}')
+    total = sum(paintings[painting_id][1] for painting_id in lines)
+
+    order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+    order_id = db.session.execute(insert(Order).values(
+        order_number=order_number,
+        user_id=user_id,
+        customer_name=customer['name'],
+        customer_email=customer['email'],
+        customer_phone=customer.get('phone'),
+        shipping_address=customer.get('address'),
+        total_amount=total,
+        status='pending',
+    ).returning(Order.id)).scalar_one()
+    db.session.execute(insert(OrderItem).values([{
+        'order_id': order_id,
+        'painting_id': painting_id,
+        'quantity': 1,
+        'price': paintings[painting_id][1],
+    } for painting_id in lines]))
+    sell(owner, lines)
+    return order_id, order_number, total
+
+
+@click.command('benchmark-checkout')
+@click.option('--sizes', default='1,10,50,200', help='Comma-separated cart sizes (distinct paintings).')
+def benchmark_checkout_command(sizes):
+    """Report statements and time per checkout against cart size.
+
+    Runs against throwaway paintings in a transaction that is rolled back.
+    """
+    from app import db, Painting
+    from query_counter import count_queries
+    sizes = [int(size) for size in sizes.split(',')]
+    click.echo(f"{'items':>6} {'statements':>11} {'ms':>8}")
+    try:
+        # Each checkout sells its paintings, so every size gets its own
+        paintings = [Painting(title=f'Benchmark {i}', category='Benchmark', price=100 + i)
+                     for i in range(sum(sizes))]
+        db.session.add_all(paintings)
+        db.session.flush()
+        for size in sizes:
+            items = [{'id': painting.id, 'quantity': 1} for painting in paintings[:size]]
+            paintings = paintings[size:]
+            customer = {'name': 'Benchmark', 'email': 'benchmark@example.com'}
+            with count_queries(db.engine) as counter:
+                started = time.perf_counter()
+                place_order(customer, items)
+                elapsed = (time.perf_counter() - started) * 1000
+            click.echo(f'{size:>6} {counter.count:>11} {elapsed:>8.1f}')
+    finally:
+        db.session.rollback()
+
+
+def init_checkout(app):
+    app.cli.add_command(benchmark_checkout_command)
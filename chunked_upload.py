@@ -0,0 +1,220 @@
+"""
+Resumable chunked upload API for large admin image uploads
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from flask import Blueprint, current_app, jsonify, request, session
+from werkzeug.utils import secure_filename
+
+chunked_upload = Blueprint('chunked_upload', __name__, url_prefix='/admin/uploads')
+
+READ_BLOCK = 1024 * 1024
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'tif', 'tiff'}
+
+# upload id -> (running sha256, bytes it covers) for uploads this process has seen
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def _tmp_folder():
+    folder = current_app.config['UPLOAD_TMP_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _paths(upload_id):
+    base = os.path.join(_tmp_folder(), upload_id)
+    return base + '.part', base + '.json'
+
+
+def _load_state(upload_id):
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        return None
+    _, meta_path = _paths(upload_id)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def _received(upload_id):
+    part_path, _ = _paths(upload_id)
+    return os.path.getsize(part_path)
+
+
+def _running_hash(upload_id, part_path, received):
+    """sha256 of the first `received` bytes of the partial file.
+
+    Reuses this process's running hash when it covers exactly those bytes,
+    otherwise (another worker took earlier chunks, or a restart) rebuilds
+    it by streaming the file once.
+    """
+    with _hashes_lock:
+        digest, length = _hashes.get(upload_id, (None, None))
+    if digest is None or length != received:
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            remaining = received
+            while remaining:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+    return digest
+
+
+def _store_hash(upload_id, digest, length):
+    with _hashes_lock:
+        _hashes[upload_id] = (digest, length)
+
+
+def _error(message, status, **extra):
+    return jsonify({'success': False, 'message': message, **extra}), status
+
+
+def purge_stale_uploads(max_age):
+    """Delete partial uploads untouched for more than max_age seconds"""
+    folder = _tmp_folder()
+    cutoff = time.time() - max_age
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            with _hashes_lock:
+                _hashes.pop(name.rsplit('.', 1)[0], None)
+
+
+@chunked_upload.before_request
+def require_admin():
+    if 'admin_id' not in session:
+        return _error('Admin login required', 401)
+
+
+@chunked_upload.route('', methods=['POST'])
+def init_upload():
+    """Start an upload: {"filename", "size", "sha256" (optional hex digest)}"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or filename.rsplit('.', 1)[-1].lower() not in ALLOWED_EXTENSIONS:
+        return _error('Images only!', 400)
+    if not isinstance(size, int) or size <= 0 or size > current_app.config['UPLOAD_MAX_SIZE']:
+        return _error('Invalid upload size', 400)
+
+    purge_stale_uploads(current_app.config['UPLOAD_STALE_AFTER'])
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(upload_id)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w') as f:
+        json.dump({'filename': filename, 'size': size,
+                   'sha256': (data.get('sha256') or '').lower() or None}, f)
+    return jsonify({'success': True, 'upload_id': upload_id, 'offset': 0,
+                    'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+
+
+@chunked_upload.route('/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Where to resume: the number of bytes received so far"""
+    state = _load_state(upload_id)
+    if state is None:
+        return _error('Upload not found', 404)
+    return jsonify({'success': True, 'offset': _received(upload_id), 'size': state['size']})
+
+
+@chunked_upload.route('/<upload_id>', methods=['PUT'])
+def put_chunk(upload_id):
+    """Append the request body at ?offset=N, streaming it straight to disk"""
+    state = _load_state(upload_id)
+    if state is None:
+        return _error('Upload not found', 404)
+    offset = request.args.get('offset', type=int)
+    request.max_content_length = current_app.config['UPLOAD_CHUNK_SIZE']
+
+    part_path, _ = _paths(upload_id)
+    with open(part_path, 'ab') as f:
+        # Serialize writers to the same upload across threads and processes
+        fcntl.flock(f, fcntl.LOCK_EX)
+        received = f.seek(0, os.SEEK_END)
+        if offset != received:
+            return _error('Offset mismatch', 409, offset=received)
+        # Hash into a copy so a rejected or interrupted chunk leaves the cached hash intact
+        digest = _running_hash(upload_id, part_path, received).copy()
+        written = 0
+        while True:
+            block = request.stream.read(READ_BLOCK)
+            if not block:
+                break
+            written += len(block)
+            if received + written > state['size']:
+                f.truncate(received)
+                return _error('Chunk exceeds declared size', 400, offset=received)
+            f.write(block)
+            digest.update(block)
+        f.flush()
+        _store_hash(upload_id, digest, received + written)
+    return jsonify({'success': True, 'offset': received + written})
+
+
+@chunked_upload.route('/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Verify size and checksum and move the file into the upload folder.
+
+    An optional {"kind": "painting"|"exhibition", "id": N} attaches the file
+    to that record and queues its renditions.
+    """
+    from app import db, Painting, Exhibition
+    from catalog_cache import catalog_cache
+    from image_jobs import queue_renditions
+    from image_service import original_fields
+    from upload_storage import release, store_file
+
+    state = _load_state(upload_id)
+    if state is None:
+        return _error('Upload not found', 404)
+    part_path, meta_path = _paths(upload_id)
+    received = _received(upload_id)
+    if received != state['size']:
+        return _error('Upload incomplete', 409, offset=received)
+
+    sha256 = _running_hash(upload_id, part_path, received).hexdigest()
+    if state['sha256'] and state['sha256'] != sha256:
+        return _error('Checksum mismatch', 422, sha256=sha256)
+
+    data = request.get_json(silent=True) or {}
+    models = {'painting': Painting, 'exhibition': Exhibition}
+    record = None
+    if data.get('kind'):
+        if data['kind'] not in models:
+            return _error('Unknown kind', 400)
+        record = db.session.get(models[data['kind']], data.get('id'))
+        if record is None:
+            return _error(f"{data['kind'].title()} not found", 404)
+
+    filename = store_file(part_path, sha256, state['filename'], current_app.config['UPLOAD_FOLDER'])
+    os.remove(meta_path)
+    with _hashes_lock:
+        _hashes.pop(upload_id, None)
+
+    fields = original_fields(filename)
+    if record is not None:
+        old_original = record.image_original
+        for field, value in fields.items():
+            setattr(record, field, value)
+        db.session.commit()
+        if old_original != filename:
+            release(old_original)
+        if data['kind'] == 'painting':
+            catalog_cache.invalidate_painting(record.id)
+        else:
+            catalog_cache.invalidate_exhibitions()
+        queue_renditions(data['kind'], record)
+    return jsonify({'success': True, 'filename': filename, 'sha256': sha256,
+                    'image_url': fields['image_url']})
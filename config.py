@@ -0,0 +1,112 @@
+"""
+Configuration profiles for create_app(); APP_CONFIG picks one (default: 'default')
+
+Values are read from the environment when this module is imported, so .env
+must be loaded first.
+"""
+import os
+
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per worker process (see db_pool.py): 'queue', or 'null' behind PgBouncer
+    # transaction pooling. Keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under max_connections.
+    DB_POOL = os.getenv('DB_POOL', 'queue')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds, -1 never
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))  # ms per statement in a request, 0 disables
+
+    UPLOAD_FOLDER = 'static/uploads'
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Resumable chunked uploads for large scans (bypass MAX_CONTENT_LENGTH per chunk)
+    UPLOAD_TMP_FOLDER = os.getenv('UPLOAD_TMP_FOLDER', 'uploads_tmp')
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+    UPLOAD_STALE_AFTER = int(os.getenv('UPLOAD_STALE_AFTER', 24 * 3600))  # seconds
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 24))
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+    CHECKOUT_MAX_ITEMS = int(os.getenv('CHECKOUT_MAX_ITEMS', 500))  # distinct paintings per order
+    RESERVATION_TTL = int(os.getenv('RESERVATION_TTL', 600))  # seconds a checkout holds its paintings
+    RESERVATION_REAP_INTERVAL = int(os.getenv('RESERVATION_REAP_INTERVAL', 60))  # seconds, 0 disables
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 30))  # seconds, 0 disables
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', os.cpu_count() or 1))  # 0 processes inline
+    QUERY_COUNT_WARN = int(os.getenv('QUERY_COUNT_WARN', 0))  # log requests over this many queries
+    # Conditional GET / Cache-Control for catalog pages and APIs
+    HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+    HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 0))  # seconds browsers reuse without asking
+    HTTP_CACHE_SHARED_MAX_AGE = int(os.getenv('HTTP_CACHE_SHARED_MAX_AGE', 60))  # seconds for proxies
+
+    # Email configuration; Flask-Mail is set up on the first send
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USE_TLS = True
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
+    ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', os.getenv('MAIL_USERNAME'))  # order and contact notifications
+    MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
+    MAIL_POOL_IDLE_TIMEOUT = int(os.getenv('MAIL_POOL_IDLE_TIMEOUT', 60))  # seconds
+    MAIL_RENDER_CACHE_SIZE = int(os.getenv('MAIL_RENDER_CACHE_SIZE', 256))
+
+    # Outbound email queue
+    MAIL_QUEUE_WORKERS = int(os.getenv('MAIL_QUEUE_WORKERS', 2))
+    MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 5))
+    MAIL_QUEUE_BACKOFF = int(os.getenv('MAIL_QUEUE_BACKOFF', 30))  # seconds, doubled per attempt
+
+    # Catalog cache: 'lru' (per worker), 'redis' (shared) or 'none'
+    CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'lru')
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 300))  # seconds
+    CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 512))
+    CATALOG_CACHE_REDIS_URL = os.getenv('CATALOG_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Google sign-in; the OAuth client and HTTP session are built on the first sign-in
+    GOOGLE_OAUTH_CLIENT_ID = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
+    GOOGLE_OAUTH_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
+    GOOGLE_DISCOVERY_URL = os.getenv('GOOGLE_DISCOVERY_URL',
+                                     'https://accounts.google.com/.well-known/openid-configuration')
+    GOOGLE_CONNECT_TIMEOUT = float(os.getenv('GOOGLE_CONNECT_TIMEOUT', 3.05))  # seconds
+    GOOGLE_READ_TIMEOUT = float(os.getenv('GOOGLE_READ_TIMEOUT', 5))  # seconds
+    # Verify the id_token locally against Google's JWKS instead of calling userinfo
+    GOOGLE_VERIFY_ID_TOKEN = os.getenv('GOOGLE_VERIFY_ID_TOKEN', '1') == '1'
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    # A sync worker serves one request at a time; `run.py serve --prod` raises the pool
+    # to GUNICORN_THREADS for gthread workers. The overflow covers background threads.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 1))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 2))
+    # Cancel a slow query before gunicorn's 30 second timeout kills the whole worker
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 25000))
+
+
+class TestingConfig(Config):
+    """In-memory database, no background threads or worker processes"""
+    TESTING = True
+    SECRET_KEY = 'testing'
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    MAIL_SUPPRESS_SEND = True
+    MAIL_QUEUE_WORKERS = 0
+    IMAGE_WORKERS = 0
+    RESERVATION_REAP_INTERVAL = 0
+    CATALOG_CACHE_BACKEND = 'none'
+    HTTP_CACHE_ENABLED = False
+
+
+CONFIGS = {
+    'default': Config,
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
@@ -0,0 +1,88 @@
+"""
+Admin dashboard statistics, fetched in one round-trip and briefly cached
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, inspect, select, text
+
+_cache = {}
+_lock = threading.Lock()
+_has_order_summary = None
+
+
+def _counts():
+    from app import db, Painting, Order, Exhibition, Contact
+    row = db.session.execute(select(
+        select(func.count(Painting.id)).scalar_subquery().label('paintings_count'),
+        select(func.count(Order.id)).scalar_subquery().label('orders_count'),
+        select(func.count(Exhibition.id)).scalar_subquery().label('exhibitions_count'),
+        select(func.count(Contact.id)).where(Contact.status == 'new').scalar_subquery().label('contacts_count'),
+    )).one()
+    return dict(row._mapping)
+
+
+def _order_summary_available():
+    """Whether the order_summary view from database_schema.sql exists"""
+    global _has_order_summary
+    if _has_order_summary is None:
+        from app import db
+        _has_order_summary = 'order_summary' in inspect(db.engine).get_view_names()
+    return _has_order_summary
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def revenue_by_day(days=14):
+    """Orders and revenue per day for the last `days` days, newest first"""
+    from app import db, Order
+    since = date.today() - timedelta(days=days - 1)
+    if _order_summary_available():
+        rows = db.session.execute(text(
+            'SELECT order_date, total_orders, total_revenue, average_order_value '
+            'FROM order_summary WHERE order_date >= :since ORDER BY order_date DESC'
+        ), {'since': since}).all()
+    else:
+        order_date = func.date(Order.created_at)
+        rows = db.session.query(
+            order_date,
+            func.count(Order.id),
+            func.sum(Order.total_amount),
+            func.avg(Order.total_amount),
+        ).filter(Order.created_at >= since).group_by(order_date).order_by(order_date.desc()).all()
+    return [{
+        'order_date': _as_date(order_date),
+        'total_orders': total_orders,
+        'total_revenue': float(total_revenue or 0),
+        'average_order_value': float(average_order_value or 0),
+    } for order_date, total_orders, total_revenue, average_order_value in rows]
+
+
+def _cached(key, ttl, loader):
+    if ttl <= 0:
+        return loader()
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+    value = loader()
+    with _lock:
+        _cache[key] = (value, now + ttl)
+    return value
+
+
+def get_dashboard_stats(ttl=0):
+    """Dashboard counters plus revenue per day, cached for ttl seconds"""
+    return _cached('dashboard', ttl, lambda: dict(_counts(), revenue_by_day=revenue_by_day()))
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -17,6 +17,14 @@ CREATE TABLE admin (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Customer accounts (Google sign-in)
+CREATE TABLE "user" (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    email VARCHAR(200) UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Paintings table
 CREATE TABLE painting (
     id SERIAL PRIMARY KEY,
@@ -28,10 +36,22 @@ CREATE TABLE painting (
     medium VARCHAR(100),
     year INTEGER CHECK (year > 1900 AND year <= EXTRACT(YEAR FROM CURRENT_DATE)),
     image_url VARCHAR(500),
+    image_key VARCHAR(64),
+    image_width INTEGER,
+    image_height INTEGER,
+    image_original VARCHAR(500),
+    image_status VARCHAR(20) CHECK (image_status IN ('processing', 'ready', 'failed')),
     available BOOLEAN DEFAULT TRUE,
     featured BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Full-text search document, weighted title > category > medium/year > description
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(medium, '') || ' ' || coalesce(year::text, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'D')
+    ) STORED
 );
 
 -- Exhibitions table
@@ -42,13 +62,20 @@ CREATE TABLE exhibition (
     date VARCHAR(100),
     description TEXT,
     image_url VARCHAR(500),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    image_key VARCHAR(64),
+    image_width INTEGER,
+    image_height INTEGER,
+    image_original VARCHAR(500),
+    image_status VARCHAR(20) CHECK (image_status IN ('processing', 'ready', 'failed')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Orders table
 CREATE TABLE "order" (
     id SERIAL PRIMARY KEY,
     order_number VARCHAR(100) UNIQUE NOT NULL,
+    user_id INTEGER REFERENCES "user"(id),
     customer_name VARCHAR(200) NOT NULL,
     customer_email VARCHAR(200) NOT NULL,
     customer_phone VARCHAR(50),
@@ -69,6 +96,33 @@ CREATE TABLE order_item (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Cart and wishlist rows belong to a user or, for guests, a session
+CREATE TABLE cart (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES "user"(id),
+    session_id VARCHAR(100),
+    painting_id INTEGER NOT NULL REFERENCES painting(id),
+    quantity INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE wishlist (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES "user"(id),
+    session_id VARCHAR(100),
+    painting_id INTEGER NOT NULL REFERENCES painting(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Checkout holds on one-of-a-kind paintings; expired rows are reaped
+CREATE TABLE reservation (
+    id SERIAL PRIMARY KEY,
+    painting_id INTEGER NOT NULL UNIQUE REFERENCES painting(id),
+    owner VARCHAR(120) NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Contact messages table
 CREATE TABLE contact (
     id SERIAL PRIMARY KEY,
@@ -80,21 +134,49 @@ CREATE TABLE contact (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Outbound email queue (drained by the mail_queue worker pool)
+CREATE TABLE outbound_email (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    ref_id INTEGER NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'dead')),
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_painting_category ON painting(category);
 CREATE INDEX idx_painting_price ON painting(price);
-CREATE INDEX idx_painting_available ON painting(available);
 CREATE INDEX idx_painting_featured ON painting(featured);
-CREATE INDEX idx_painting_created_at ON painting(created_at);
+-- Keyset (created_at, id) pages; the partial one serves the storefront's available paintings
+CREATE INDEX ix_painting_available_created_at ON painting(created_at, id) WHERE available;
+CREATE INDEX ix_painting_featured ON painting(created_at) WHERE featured;
+CREATE INDEX ix_painting_created_at_id ON painting(created_at, id);
 
 CREATE INDEX idx_order_status ON "order"(status);
-CREATE INDEX idx_order_created_at ON "order"(created_at);
+CREATE INDEX ix_order_created_at_id ON "order"(created_at, id);
+CREATE INDEX ix_order_user_id_created_at ON "order"(user_id, created_at);
+CREATE INDEX ix_order_item_order_id ON order_item(order_id);
 CREATE INDEX idx_order_customer_email ON "order"(customer_email);
 
 CREATE INDEX idx_contact_status ON contact(status);
-CREATE INDEX idx_contact_created_at ON contact(created_at);
+CREATE INDEX ix_contact_created_at_id ON contact(created_at, id);
+
+CREATE INDEX ix_exhibition_created_at_id ON exhibition(created_at, id);
+CREATE INDEX idx_painting_search ON painting USING GIN (search_vector);
+
+CREATE UNIQUE INDEX uq_cart_user_id_painting_id ON cart(user_id, painting_id);
+CREATE UNIQUE INDEX uq_cart_session_id_painting_id ON cart(session_id, painting_id);
+CREATE UNIQUE INDEX uq_wishlist_user_id_painting_id ON wishlist(user_id, painting_id);
+CREATE UNIQUE INDEX uq_wishlist_session_id_painting_id ON wishlist(session_id, painting_id);
+
+CREATE INDEX ix_reservation_expires_at ON reservation(expires_at);
 
-CREATE INDEX idx_exhibition_created_at ON exhibition(created_at);
+CREATE INDEX idx_outbound_email_due ON outbound_email(next_attempt_at) WHERE status = 'pending';
 
 -- Create trigger to update updated_at column
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -108,6 +190,9 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_painting_updated_at BEFORE UPDATE ON painting
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_exhibition_updated_at BEFORE UPDATE ON exhibition
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 CREATE TRIGGER update_order_updated_at BEFORE UPDATE ON "order"
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
@@ -140,6 +225,18 @@ SELECT
 FROM painting 
 GROUP BY category;
 
+-- Available paintings grouped by every facet the paintings page filters on
+CREATE VIEW painting_facets AS
+SELECT
+    category,
+    medium,
+    year,
+    price,
+    COUNT(*) as total
+FROM painting
+WHERE available = TRUE
+GROUP BY category, medium, year, price;
+
 CREATE VIEW order_summary AS
 SELECT 
     DATE(created_at) as order_date,
@@ -0,0 +1,192 @@
+"""
+Database connection pooling: engine options from config, per-worker pool stats
+and a statement timeout for queries run while handling a request
+
+DB_POOL=queue keeps up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections open per
+worker process. DB_POOL=null opens a connection per checkout and closes it on
+return, which is what PgBouncer in transaction pooling mode expects; the
+statement timeout is set with SET LOCAL, so it never leaks to another client
+sharing the server connection.
+"""
+import bisect
+import os
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolStats:
+    """Checkout counters for the pools in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checked_out = 0
+            self.waiting = 0
+            self.checkouts = 0
+            self.timeouts = 0
+            self.errors = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def start_wait(self):
+        with self._lock:
+            self.waiting += 1
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def record_failure(self, seconds, timed_out):
+        """A checkout that gave up waiting for the pool (timed_out) or failed to connect"""
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.errors += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self):
+        with self._lock:
+            bounds = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + ['inf']
+            return {
+                'checked_out': self.checked_out,
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'wait_ms_total': round(self.wait_seconds * 1000, 3),
+                'wait_ms_max': round(self.max_wait_seconds * 1000, 3),
+                'checkout_latency_ms': dict(zip(bounds, self.histogram)),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _TimedPool:
+    """Records how long each checkout waited; pool.recreate() keeps the subclass"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        pool_stats.start_wait()
+        try:
+            connection = super()._do_get()
+        except Exception as e:
+            pool_stats.record_failure(time.perf_counter() - started, isinstance(e, exc.TimeoutError))
+            raise
+        pool_stats.record_checkout(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, record):
+        pool_stats.record_checkin()
+        super()._do_return_conn(record)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the DB_POOL* settings"""
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return {}
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}  # Flask-SQLAlchemy gives in-memory SQLite a single shared connection
+    if config['DB_POOL'] == 'null':
+        return {'poolclass': TimedNullPool}
+    if config['DB_POOL'] != 'queue':
+        raise ValueError(f"DB_POOL must be 'queue' or 'null', not {config['DB_POOL']!r}")
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def configure_engine(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS before db.init_app(); explicit options win"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+
+
+def pool_status(engine):
+    """Live pool figures for this worker, for the admin pool endpoint"""
+    pool = engine.pool
+    status = {'pid': os.getpid(), 'pool': pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+    status.update(pool_stats.snapshot())
+    return status
+
+
+def init_db_pool(app):
+    """Cancel statements that run longer than DB_STATEMENT_TIMEOUT ms during a request (0 disables)"""
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT', 0)
+    if not timeout:
+        return
+    from flask import has_request_context
+    extension = app.extensions['sqlalchemy']
+    with app.app_context():
+        engine = extension.engine
+
+    if engine.dialect.name == 'postgresql':
+        # SET LOCAL lasts until the transaction ends, so it is safe behind PgBouncer
+        def set_timeout(session, transaction, connection):
+            if has_request_context() and connection.engine is engine:
+                connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+        event.listen(extension.session, 'after_begin', set_timeout)
+
+    elif engine.dialect.name == 'sqlite':
+        # SQLite has no server-side timeout; abort from the progress handler instead
+        def start_clock(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                deadline = time.monotonic() + timeout / 1000
+                cursor.connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+
+        def stop_clock(conn, cursor, *args):
+            cursor.connection.set_progress_handler(None, 0)
+
+        def stop_clock_on_error(context):
+            cursor = getattr(context.execution_context, 'cursor', None)
+            if cursor is not None:
+                cursor.connection.set_progress_handler(None, 0)
+
+        event.listen(engine, 'before_cursor_execute', start_clock)
+        event.listen(engine, 'after_cursor_execute', stop_clock)
+        event.listen(engine, 'handle_error', stop_clock_on_error)
+
+    else:
+        print(f"Warning: DB_STATEMENT_TIMEOUT is not supported on {engine.dialect.name}")
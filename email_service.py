@@ -1,29 +1,308 @@
 """
 Email service for sending notifications
 """
-import os
-from flask import render_template
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from flask_mail import Mail, Message
 
 mail = Mail()
 
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP sessions open and reuses them across sends"""
+
+    def __init__(self, mail, size=2, idle_timeout=60):
+        self.mail = mail
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.messages_sent = 0
+
+    def _open(self):
+        conn = self.mail.connect()
+        conn.__enter__()
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            if conn.host is not None:
+                conn.host.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def _alive(self, conn):
+        if conn.host is None:
+            return True
+        try:
+            return conn.host.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self):
+        """Check out an idle connection, or open a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.idle_timeout and self._alive(conn):
+                with self._lock:
+                    self.connections_reused += 1
+                return conn
+            self._close(conn)
+        return self._open()
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool, closing it if broken or the pool is full"""
+        if not broken:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except OSError as e:
+            # Protocol-level errors (e.g. a refused recipient) leave the session usable
+            broken = (isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError))
+                      or not isinstance(e, smtplib.SMTPException))
+            self.release(conn, broken=broken)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def send(self, msg):
+        """Send one message over a pooled connection, reconnecting once if it was dropped"""
+        self.send_batch([msg])
+
+    def send_batch(self, messages):
+        """Send several messages over a single connection"""
+        pending = list(messages)
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    while pending:
+                        conn.send(pending[0])
+                        pending.pop(0)
+                        with self._lock:
+                            self.messages_sent += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections_opened': self.connections_opened,
+                'connections_reused': self.connections_reused,
+                'messages_sent': self.messages_sent,
+                'idle_connections': len(self._idle),
+            }
+
+
+pool = SMTPConnectionPool(mail)
+
+EMAIL_TEMPLATES = (
+    'emails/order_confirmation.html',
+    'emails/order_confirmation.txt',
+    'emails/admin_order_notification.html',
+    'emails/admin_order_notification.txt',
+    'emails/contact_notification.html',
+    'emails/contact_notification.txt',
+    'emails/contact_confirmation.html',
+    'emails/contact_confirmation.txt',
+)
+
+
+class EmailRenderer:
+    """Holds the compiled email templates and memoizes rendered bodies"""
+
+    def __init__(self, cache_size=256):
+        self.cache_size = cache_size
+        self._templates = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, jinja_env, names=EMAIL_TEMPLATES):
+        for name in names:
+            self._templates[name] = jinja_env.get_template(name)
+
+    def render(self, name, cache_key, **context):
+        key = (name, cache_key)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        body = self._templates[name].render(**context)
+        with self._lock:
+            self._cache[key] = body
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body
+
+    def invalidate(self, cache_key):
+        with self._lock:
+            for key in [k for k in self._cache if k[1] == cache_key]:
+                del self._cache[key]
+
+
+renderer = EmailRenderer()
+
+_init_lock = threading.Lock()
+
+
 def init_mail(app):
     """Initialize Flask-Mail with the app"""
     mail.init_app(app)
+    pool.size = app.config.get('MAIL_POOL_SIZE', pool.size)
+    pool.idle_timeout = app.config.get('MAIL_POOL_IDLE_TIMEOUT', pool.idle_timeout)
+    renderer.cache_size = app.config.get('MAIL_RENDER_CACHE_SIZE', renderer.cache_size)
+    renderer.compile(app.jinja_env)
+    app.extensions['email_service'] = renderer
+
+
+def ensure_mail():
+    """Initialize mail for the current app on its first email rather than at startup
+
+    Call before building a Message: Flask-Mail fills in its defaults from the
+    app's mail extension and raises KeyError if it is not registered yet.
+    """
+    from flask import current_app
+    app = current_app._get_current_object()
+    with _init_lock:
+        if 'email_service' not in app.extensions:
+            init_mail(app)
+
+def _sender():
+    from flask import current_app
+    return current_app.config.get('MAIL_DEFAULT_SENDER') or current_app.config.get('MAIL_USERNAME')
+
+def _admin_email():
+    from flask import current_app
+    return current_app.config.get('ADMIN_EMAIL') or current_app.config.get('MAIL_USERNAME')
+
+def snapshot_order(order):
+    """Copy an order and its items into plain dicts for rendering"""
+    if isinstance(order, dict):
+        return order
+    return {
+        'order_number': order.order_number,
+        'customer_name': order.customer_name,
+        'customer_email': order.customer_email,
+        'customer_phone': order.customer_phone,
+        'shipping_address': order.shipping_address,
+        'total_amount': order.total_amount,
+        'status': order.status,
+        'created_at': order.created_at,
+        'order_items': [{
+            'quantity': item.quantity,
+            'price': item.price,
+            'painting': {'id': item.painting.id, 'title': item.painting.title},
+        } for item in order.order_items],
+    }
+
+def snapshot_contact(contact):
+    """Copy a contact message into a plain dict for rendering"""
+    if isinstance(contact, dict):
+        return contact
+    return {
+        'id': contact.id,
+        'name': contact.name,
+        'email': contact.email,
+        'subject': contact.subject,
+        'message': contact.message,
+        'created_at': contact.created_at,
+    }
+
+def _render_pair(template, cache_key, **context):
+    html = renderer.render(f'emails/{template}.html', cache_key, **context)
+    body = renderer.render(f'emails/{template}.txt', cache_key, **context)
+    return html, body
+
+def order_confirmation_message(order, customer_email):
+    """Build the order confirmation email for the customer"""
+    ensure_mail()
+    order = snapshot_order(order)
+    msg = Message(
+        subject=f'Order Confirmation - {order["order_number"]}',
+        recipients=[customer_email],
+        sender=_sender()
+    )
+    msg.html, msg.body = _render_pair('order_confirmation', order['order_number'], order=order)
+    return msg
+
+def order_notification_message(order):
+    """Build the new order notification email for the admin"""
+    ensure_mail()
+    order = snapshot_order(order)
+    msg = Message(
+        subject=f'New Order Received - {order["order_number"]}',
+        recipients=[_admin_email()],
+        sender=_sender()
+    )
+    msg.html, msg.body = _render_pair('admin_order_notification', order['order_number'], order=order)
+    return msg
+
+def contact_notification_message(contact):
+    """Build the contact form notification email for the admin"""
+    ensure_mail()
+    contact = snapshot_contact(contact)
+    msg = Message(
+        subject=f'New Contact Message: {contact["subject"]}',
+        recipients=[_admin_email()],
+        sender=_sender()
+    )
+    msg.html, msg.body = _render_pair('contact_notification', f'contact-{contact["id"]}', contact=contact)
+    return msg
+
+def contact_confirmation_message(contact):
+    """Build the confirmation email for the person who submitted the contact form"""
+    ensure_mail()
+    contact = snapshot_contact(contact)
+    msg = Message(
+        subject='Thank you for contacting us',
+        recipients=[contact['email']],
+        sender=_sender()
+    )
+    msg.html, msg.body = _render_pair('contact_confirmation', f'contact-{contact["id"]}', contact=contact)
+    return msg
+
+def send_batch(messages):
+    """Send several messages over one pooled SMTP connection"""
+    ensure_mail()
+    try:
+        pool.send_batch(messages)
+        return True
+    except Exception as e:
+        print(f"Error sending email batch: {e}")
+        return False
 
 def send_order_confirmation(order, customer_email):
     """Send order confirmation email to customer"""
     try:
-        msg = Message(
-            subject=f'Order Confirmation - {order.order_number}',
-            recipients=[customer_email],
-            sender=os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
-        )
-        
-        msg.html = render_template('emails/order_confirmation.html', order=order)
-        msg.body = render_template('emails/order_confirmation.txt', order=order)
-        
-        mail.send(msg)
+        pool.send(order_confirmation_message(order, customer_email))
         return True
     except Exception as e:
         print(f"Error sending order confirmation: {e}")
@@ -32,38 +311,28 @@ def send_order_confirmation(order, customer_email):
 def send_order_notification_to_admin(order):
     """Send new order notification to admin"""
     try:
-        admin_email = os.getenv('ADMIN_EMAIL', os.getenv('MAIL_USERNAME'))
-        
-        msg = Message(
-            subject=f'New Order Received - {order.order_number}',
-            recipients=[admin_email],
-            sender=os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
-        )
-        
-        msg.html = render_template('emails/admin_order_notification.html', order=order)
-        msg.body = render_template('emails/admin_order_notification.txt', order=order)
-        
-        mail.send(msg)
+        pool.send(order_notification_message(order))
         return True
     except Exception as e:
         print(f"Error sending admin notification: {e}")
         return False
 
+def send_order_emails(order):
+    """Send the customer confirmation and admin notification over one connection"""
+    try:
+        order = snapshot_order(order)
+        return send_batch([
+            order_confirmation_message(order, order['customer_email']),
+            order_notification_message(order),
+        ])
+    except Exception as e:
+        print(f"Error sending order emails: {e}")
+        return False
+
 def send_contact_notification(contact):
     """Send contact form notification to admin"""
     try:
-        admin_email = os.getenv('ADMIN_EMAIL', os.getenv('MAIL_USERNAME'))
-        
-        msg = Message(
-            subject=f'New Contact Message: {contact.subject}',
-            recipients=[admin_email],
-            sender=os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
-        )
-        
-        msg.html = render_template('emails/contact_notification.html', contact=contact)
-        msg.body = render_template('emails/contact_notification.txt', contact=contact)
-        
-        mail.send(msg)
+        pool.send(contact_notification_message(contact))
         return True
     except Exception as e:
         print(f"Error sending contact notification: {e}")
@@ -72,16 +341,7 @@ def send_contact_notification(contact):
 def send_contact_confirmation(contact):
     """Send confirmation email to person who submitted contact form"""
     try:
-        msg = Message(
-            subject='Thank you for contacting us',
-            recipients=[contact.email],
-            sender=os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
-        )
-        
-        msg.html = render_template('emails/contact_confirmation.html', contact=contact)
-        msg.body = render_template('emails/contact_confirmation.txt', contact=contact)
-        
-        mail.send(msg)
+        pool.send(contact_confirmation_message(contact))
         return True
     except Exception as e:
         print(f"Error sending contact confirmation: {e}")
@@ -0,0 +1,190 @@
+"""
+Faceted browsing over category, medium, year and price buckets
+"""
+from flask import request, url_for
+from sqlalchemy import and_, func, inspect, or_, text
+
+FACETS = ('category', 'medium', 'year', 'price')
+
+# Price buckets as [low, high) in dollars; None is open-ended
+PRICE_BUCKETS = [(None, 500), (500, 1000), (1000, 2000), (2000, None)]
+
+_has_painting_facets = None
+
+
+def bucket_key(low, high):
+    return f"{low or 0}-{high or ''}"
+
+
+def bucket_label(low, high):
+    if low is None:
+        return f'Under ${high:,}'
+    if high is None:
+        return f'${low:,}+'
+    return f'${low:,} – ${high:,}'
+
+
+def price_bucket(price):
+    """Key of the bucket a price falls in"""
+    for low, high in PRICE_BUCKETS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return bucket_key(low, high)
+
+
+def parse_selection(args):
+    """{facet: [values]} from repeated query args such as ?category=A&category=B&year=2024"""
+    selection = {}
+    for facet in FACETS:
+        values = [value for value in args.getlist(facet) if value]
+        if facet == 'year':
+            values = [int(value) for value in values if value.isdigit()]
+        elif facet == 'price':
+            keys = {bucket_key(low, high) for low, high in PRICE_BUCKETS}
+            values = [value for value in values if value in keys]
+        if values:
+            selection[facet] = sorted(set(values))
+    return selection
+
+
+def selection_key(selection):
+    """Stable string for a selection, for cache keys"""
+    return ';'.join(f"{facet}={'|'.join(map(str, values))}" for facet, values in sorted(selection.items()))
+
+
+def facet_filters(selection):
+    """SQLAlchemy criteria for a selection: OR within a facet, AND across facets"""
+    from app import Painting
+    filters = []
+    for facet in ('category', 'medium', 'year'):
+        if selection.get(facet):
+            filters.append(getattr(Painting, facet).in_(selection[facet]))
+    if selection.get('price'):
+        ranges = []
+        for low, high in PRICE_BUCKETS:
+            if bucket_key(low, high) in selection['price']:
+                bound = [Painting.price >= low] if low is not None else []
+                bound += [Painting.price < high] if high is not None else []
+                ranges.append(and_(*bound))
+        filters.append(or_(*ranges))
+    return filters
+
+
+def price_range_filters(min_price, max_price):
+    """SQLAlchemy criteria for the free-form min_price/max_price inputs"""
+    from app import Painting
+    filters = []
+    if min_price is not None:
+        filters.append(Painting.price >= min_price)
+    if max_price is not None:
+        filters.append(Painting.price <= max_price)
+    return filters
+
+
+def _painting_facets_available():
+    """Whether the painting_facets view from database_schema.sql exists"""
+    global _has_painting_facets
+    if _has_painting_facets is None:
+        from app import db
+        _has_painting_facets = 'painting_facets' in inspect(db.engine).get_view_names()
+    return _has_painting_facets
+
+
+def _load_facet_rows(filters=()):
+    from app import db, Painting
+    if _painting_facets_available() and not filters:
+        rows = db.session.execute(text(
+            'SELECT category, medium, year, price, total FROM painting_facets'
+        )).all()
+    else:
+        try:
+            rows = db.session.query(
+                Painting.category, Painting.medium, Painting.year, Painting.price, func.count(Painting.id)
+            ).filter(Painting.available == True, *filters).group_by(
+                Painting.category, Painting.medium, Painting.year, Painting.price
+            ).all()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error counting facets: {e}")
+            return []
+    return [{
+        'category': category,
+        'medium': medium,
+        'year': year,
+        'price': price_bucket(float(price)),
+        'total': total,
+    } for category, medium, year, price, total in rows]
+
+
+def facet_rows(q='', min_price=None, max_price=None):
+    """Available paintings grouped by every facet value, from one cached query.
+
+    Only paintings matching the search q and the price range are counted. The
+    catalog cache drops it on the next admin write.
+    """
+    from catalog_cache import catalog_cache
+    from search import search_filter
+
+    def load():
+        filters = price_range_filters(min_price, max_price)
+        if q:
+            match = search_filter(q)
+            if match is None:
+                return []  # nothing to search for, so no results
+            filters.append(match)
+        return _load_facet_rows(filters)
+    return catalog_cache.get_list('facets', load, q=q, min_price=min_price, max_price=max_price)
+
+
+def facet_counts(selection, q='', min_price=None, max_price=None):
+    """{facet: [{'value', 'label', 'count', 'selected'}]} for the facet sidebar.
+
+    Each facet is counted with every other facet's selection applied but not
+    its own, so sibling values show how many results picking them would add.
+    The search and price range narrow every facet, as they do the results.
+    """
+    rows = facet_rows(q, min_price, max_price)
+    counts = {facet: {} for facet in FACETS}
+    for row in rows:
+        failed = [facet for facet, values in selection.items() if row[facet] not in values]
+        if len(failed) > 1:
+            continue
+        for facet in FACETS:
+            if row[facet] is None or (failed and failed[0] != facet):
+                continue
+            counts[facet][row[facet]] = counts[facet].get(row[facet], 0) + row['total']
+
+    for facet, values in selection.items():
+        for value in values:
+            counts[facet].setdefault(value, 0)
+
+    labels = {bucket_key(low, high): bucket_label(low, high) for low, high in PRICE_BUCKETS}
+    order = {
+        'category': lambda value: value,
+        'medium': lambda value: value,
+        'year': lambda value: -value,
+        'price': list(labels).index,
+    }
+    return {facet: [{
+        'value': value,
+        'label': labels[value] if facet == 'price' else str(value),
+        'count': counts[facet][value],
+        'selected': value in selection.get(facet, []),
+    } for value in sorted(counts[facet], key=order[facet])] for facet in FACETS}
+
+
+def without_args_url(*names):
+    """URL of the current view with the named query args removed, back on the first page"""
+    args = request.args.copy()
+    for name in ('cursor', *names):
+        args.pop(name, None)
+    return url_for(request.endpoint, **request.view_args, **args.to_dict(flat=False))
+
+
+def facet_url(facet, value):
+    """URL of the current view with one facet value toggled, back on the first page"""
+    args = request.args.copy()
+    args.pop('cursor', None)
+    values = args.getlist(facet)
+    value = str(value)
+    args.setlist(facet, [v for v in values if v != value] if value in values else values + [value])
+    return url_for(request.endpoint, **request.view_args, **args.to_dict(flat=False))
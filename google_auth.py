@@ -1,51 +1,252 @@
+"""
+Google sign-in
+
+Importing this module is cheap: requests, oauthlib and PyJWT are imported and
+the OAuth client is built on the first sign-in (see oauth()).
+"""
 import json
 import os
-import requests
-from flask import Blueprint, redirect, request, url_for, flash
+import re
+import threading
+import time
+from flask import Blueprint, current_app, redirect, request, url_for, flash
 from flask_login import login_user, logout_user, login_required
-from oauthlib.oauth2 import WebApplicationClient
 
-# Disable HTTPS requirement for local development only
-if os.environ.get('FLASK_ENV') == 'development' or not os.environ.get('REPLIT_DEV_DOMAIN'):
-    os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+_oauth_lock = threading.Lock()
+
+
+def _jwt():
+    try:
+        import jwt
+    except ImportError:  # PyJWT[crypto] not installed: always use the userinfo endpoint
+        return None
+    return jwt
+
+
+def _cache_ttl(response, default_ttl):
+    """Seconds a response may be cached for, from its Cache-Control and Age headers"""
+    cache_control = response.headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if not match:
+        return default_ttl
+    age = int(response.headers.get("Age", "0") or 0)
+    return max(int(match.group(1)) - age, 0)
+
+
+class DiscoveryCache:
+    """Caches the OpenID discovery document for its Cache-Control lifetime.
+
+    Expired documents are served while a background thread refreshes them,
+    and kept if the refresh fails.
+    """
+
+    def __init__(self, http, url, timeout, default_ttl=3600, retry_after=30):
+        self.http = http
+        self.url = url
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.retry_after = retry_after
+        self._document = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        response = self.http.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        document = response.json()
+        with self._lock:
+            self._document = document
+            self._expires_at = time.monotonic() + _cache_ttl(response, self.default_ttl)
+        return document
+
+    def _background_refresh(self):
+        try:
+            self._fetch()
+        except Exception as e:
+            print(f"Error refreshing Google discovery document: {e}")
+            with self._lock:
+                self._expires_at = time.monotonic() + self.retry_after
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        with self._lock:
+            document = self._document
+            fresh = time.monotonic() < self._expires_at
+            start_refresh = document is not None and not fresh and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if document is None:
+            return self._fetch()
+        if start_refresh:
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+        return document
+
+    def clear(self):
+        with self._lock:
+            self._document = None
+            self._expires_at = 0
+
+
+def get_google_provider_cfg():
+    return oauth().discovery_cache.get()
+
+
+class JWKSCache:
+    """Caches Google's signing keys by key id.
 
-GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_OAUTH_CLIENT_ID")
-GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_OAUTH_CLIENT_SECRET")
-GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+    An unknown kid forces a refetch (rate limited by min_refresh) so rotated
+    keys are picked up before the cached set expires.
+    """
 
-# Determine the redirect URL based on environment
-if os.environ.get("REPLIT_DEV_DOMAIN"):
-    DEV_REDIRECT_URL = f'https://{os.environ.get("REPLIT_DEV_DOMAIN")}/google_login/callback'
-else:
-    # Local development
-    DEV_REDIRECT_URL = 'http://localhost:5000/google_login/callback'
+    def __init__(self, http, timeout, default_ttl=3600, min_refresh=60):
+        self.http = http
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.min_refresh = min_refresh
+        self._keys = {}
+        self._expires_at = 0
+        self._fetched_at = None
+        self._lock = threading.Lock()
 
-if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
+    def _fetch(self, jwks_uri):
+        response = self.http.get(jwks_uri, timeout=self.timeout)
+        response.raise_for_status()
+        jwt = _jwt()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            if jwk.get("kty") == "RSA" and jwk.get("kid"):
+                keys[jwk["kid"]] = jwt.PyJWK(jwk, algorithm="RS256").key
+        now = time.monotonic()
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + _cache_ttl(response, self.default_ttl)
+
+    def get_key(self, kid, jwks_uri):
+        with self._lock:
+            key = self._keys.get(kid)
+            now = time.monotonic()
+            expired = now >= self._expires_at
+            may_refresh = self._fetched_at is None or now - self._fetched_at >= self.min_refresh
+        if expired or (key is None and may_refresh):
+            try:
+                self._fetch(jwks_uri)
+            except Exception as e:
+                if key is None:
+                    raise
+                print(f"Error refreshing Google JWKS, using cached keys: {e}")
+            with self._lock:
+                key = self._keys.get(kid)
+        if key is None:
+            raise ValueError(f"No signing key found for kid {kid}")
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._expires_at = 0
+            self._fetched_at = None
+
+
+class GoogleOAuth:
+    """One app's OAuth client, keep-alive HTTP session and discovery/JWKS caches"""
+
+    def __init__(self, config):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from oauthlib.oauth2 import WebApplicationClient
+        self.client_id = config['GOOGLE_OAUTH_CLIENT_ID']
+        self.client_secret = config['GOOGLE_OAUTH_CLIENT_SECRET']
+        # (connect, read) timeouts in seconds for every call to Google
+        self.timeout = (config['GOOGLE_CONNECT_TIMEOUT'], config['GOOGLE_READ_TIMEOUT'])
+        self.verify_id_token = config['GOOGLE_VERIFY_ID_TOKEN'] and _jwt() is not None
+        # Shared keep-alive session so sign-ins reuse TLS connections to Google
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.client = WebApplicationClient(self.client_id)
+        self.discovery_cache = DiscoveryCache(self.http, config['GOOGLE_DISCOVERY_URL'], self.timeout)
+        self.jwks_cache = JWKSCache(self.http, self.timeout)
+
+
+def oauth():
+    """The current app's GoogleOAuth, built on first use"""
+    app = current_app._get_current_object()
+    with _oauth_lock:
+        if 'google_oauth' not in app.extensions:
+            app.extensions['google_oauth'] = GoogleOAuth(app.config)
+        return app.extensions['google_oauth']
+
+
+def verify_id_token(id_token, provider_cfg):
+    """Verify a Google id_token signature and claims and return its claims"""
+    jwt = _jwt()
+    header = jwt.get_unverified_header(id_token)
+    if header.get("alg") != "RS256":
+        raise ValueError(f"Unexpected id_token algorithm {header.get('alg')}")
+    key = oauth().jwks_cache.get_key(header.get("kid"), provider_cfg["jwks_uri"])
+    claims = jwt.decode(
+        id_token,
+        key,
+        algorithms=["RS256"],
+        audience=current_app.config['GOOGLE_OAUTH_CLIENT_ID'],
+        leeway=60,
+        options={"require": ["iss", "aud", "exp", "iat", "sub"]},
+    )
+    issuers = set(GOOGLE_ISSUERS)
+    if provider_cfg.get("issuer"):
+        issuers.add(provider_cfg["issuer"])
+    if claims["iss"] not in issuers:
+        raise ValueError(f"Unexpected id_token issuer {claims['iss']}")
+    return claims
+
+
+google_auth = Blueprint("google_auth", __name__)
+
+
+def init_google_auth(app):
+    """Register the sign-in routes; print setup help when the dev server has credentials"""
+    # Disable HTTPS requirement for local development only
+    if os.environ.get('FLASK_ENV') == 'development' or not os.environ.get('REPLIT_DEV_DOMAIN'):
+        os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
+    app.register_blueprint(google_auth)
+
+    if not (app.debug and app.config['GOOGLE_OAUTH_CLIENT_ID'] and app.config['GOOGLE_OAUTH_CLIENT_SECRET']):
+        return
+    # Determine the redirect URL based on environment
+    if os.environ.get("REPLIT_DEV_DOMAIN"):
+        dev_redirect_url = f'https://{os.environ.get("REPLIT_DEV_DOMAIN")}/google_login/callback'
+    else:
+        # Local development
+        dev_redirect_url = 'http://localhost:5000/google_login/callback'
     print(f"""
     ═══════════════════════════════════════════════════════════
     Google OAuth Configuration:
     1. Go to https://console.cloud.google.com/apis/credentials
     2. Select your OAuth 2.0 Client ID
-    3. Add {DEV_REDIRECT_URL} to Authorized redirect URIs
+    3. Add {dev_redirect_url} to Authorized redirect URIs
     4. Save the changes
     
-    Current redirect URI: {DEV_REDIRECT_URL}
+    Current redirect URI: {dev_redirect_url}
     ═══════════════════════════════════════════════════════════
     """)
 
-client = WebApplicationClient(GOOGLE_CLIENT_ID) if GOOGLE_CLIENT_ID else None
-
-google_auth = Blueprint("google_auth", __name__)
-
 
 @google_auth.route("/google_login")
 def login():
-    if not GOOGLE_CLIENT_ID:
+    if not current_app.config['GOOGLE_OAUTH_CLIENT_ID']:
         flash('Google OAuth is not configured. Please contact the administrator.', 'error')
-        return redirect(url_for('user_login'))
+        return redirect(url_for('main.user_login'))
     
     try:
-        google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
+        google_provider_cfg = get_google_provider_cfg()
         authorization_endpoint = google_provider_cfg["authorization_endpoint"]
 
         # Generate and store state parameter for CSRF protection
@@ -60,7 +261,7 @@ def login():
         if os.environ.get("REPLIT_DEV_DOMAIN") or request.url.startswith("https://"):
             redirect_uri = redirect_uri.replace("http://", "https://")
 
-        request_uri = client.prepare_request_uri(
+        request_uri = oauth().client.prepare_request_uri(
             authorization_endpoint,
             redirect_uri=redirect_uri,
             scope=["openid", "email", "profile"],
@@ -69,7 +270,7 @@ def login():
         return redirect(request_uri)
     except Exception as e:
         flash(f'Error connecting to Google: {str(e)}', 'error')
-        return redirect(url_for('user_login'))
+        return redirect(url_for('main.user_login'))
 
 
 @google_auth.route("/google_login/callback")
@@ -77,9 +278,9 @@ def callback():
     # Import here to avoid circular import
     from app import db, User
     
-    if not GOOGLE_CLIENT_ID:
+    if not current_app.config['GOOGLE_OAUTH_CLIENT_ID']:
         flash('Google OAuth is not configured. Please contact the administrator.', 'error')
-        return redirect(url_for('user_login'))
+        return redirect(url_for('main.user_login'))
     
     try:
         # Verify state parameter for CSRF protection
@@ -89,15 +290,15 @@ def callback():
         
         if not state or state != stored_state:
             flash('Invalid state parameter. Please try logging in again.', 'error')
-            return redirect(url_for('user_login'))
+            return redirect(url_for('main.user_login'))
         
         code = request.args.get("code")
         if not code:
             error = request.args.get("error")
             flash(f'Google authentication failed: {error}', 'error')
-            return redirect(url_for('user_login'))
+            return redirect(url_for('main.user_login'))
         
-        google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
+        google_provider_cfg = get_google_provider_cfg()
         token_endpoint = google_provider_cfg["token_endpoint"]
 
         # Use the correct redirect URI based on environment
@@ -108,40 +309,51 @@ def callback():
             authorization_response = authorization_response.replace("http://", "https://")
             redirect_url = redirect_url.replace("http://", "https://")
 
-        token_url, headers, body = client.prepare_token_request(
+        google = oauth()
+        token_url, headers, body = google.client.prepare_token_request(
             token_endpoint,
             authorization_response=authorization_response,
             redirect_url=redirect_url,
             code=code,
         )
-        token_response = requests.post(
+        token_response = google.http.post(
             token_url,
             headers=headers,
             data=body,
-            auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
+            auth=(google.client_id, google.client_secret),
+            timeout=google.timeout,
         )
 
         if token_response.status_code != 200:
             flash(f'Failed to get access token: {token_response.text}', 'error')
-            return redirect(url_for('user_login'))
+            return redirect(url_for('main.user_login'))
+
+        token_json = token_response.json()
+        google.client.parse_request_body_response(json.dumps(token_json))
 
-        client.parse_request_body_response(json.dumps(token_response.json()))
+        userinfo = None
+        if google.verify_id_token and token_json.get("id_token"):
+            try:
+                userinfo = verify_id_token(token_json["id_token"], google_provider_cfg)
+            except Exception as e:
+                print(f"Local id_token verification failed, falling back to userinfo: {e}")
 
-        userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
-        uri, headers, body = client.add_token(userinfo_endpoint)
-        userinfo_response = requests.get(uri, headers=headers, data=body)
+        if userinfo is None:
+            userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
+            uri, headers, body = google.client.add_token(userinfo_endpoint)
+            userinfo_response = google.http.get(uri, headers=headers, data=body, timeout=google.timeout)
 
-        if userinfo_response.status_code != 200:
-            flash('Failed to get user information from Google.', 'error')
-            return redirect(url_for('user_login'))
+            if userinfo_response.status_code != 200:
+                flash('Failed to get user information from Google.', 'error')
+                return redirect(url_for('main.user_login'))
 
-        userinfo = userinfo_response.json()
+            userinfo = userinfo_response.json()
         if userinfo.get("email_verified"):
             users_email = userinfo["email"]
             users_name = userinfo.get("given_name", userinfo.get("name", "User"))
         else:
             flash("User email not available or not verified by Google.", "error")
-            return redirect(url_for('user_login'))
+            return redirect(url_for('main.user_login'))
 
         user = User.query.filter_by(email=users_email).first()
         if not user:
@@ -154,11 +366,11 @@ def callback():
 
         login_user(user)
 
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     except Exception as e:
         flash(f'Authentication error: {str(e)}', 'error')
-        return redirect(url_for('user_login'))
+        return redirect(url_for('main.user_login'))
 
 
 @google_auth.route("/user/logout")
@@ -169,4 +381,4 @@ def user_logout():
     # Clear session data
     flask_session.clear()
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
@@ -0,0 +1,101 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) and Cache-Control rules for catalog routes
+"""
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+
+_templates_version = ''
+
+
+def init_http_cache(app):
+    """Record the templates' version so a deploy changes every page's ETag"""
+    global _templates_version
+    app.config.setdefault('HTTP_CACHE_ENABLED', True)
+    app.config.setdefault('HTTP_CACHE_MAX_AGE', 0)
+    app.config.setdefault('HTTP_CACHE_SHARED_MAX_AGE', 60)
+    latest = 0
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    _templates_version = str(int(latest))
+
+
+def _catalog_models():
+    from app import Painting, Exhibition
+    return {'paintings': Painting, 'exhibitions': Exhibition}
+
+
+def catalog_version(scope):
+    """(row count, latest modification) of the paintings or exhibitions table.
+
+    The count catches deletes, which leave no timestamp behind. The aggregate
+    is kept in the catalog cache, which every catalog write invalidates, so
+    warm requests don't query the table.
+    """
+    from app import db
+    from catalog_cache import catalog_cache
+    model = _catalog_models()[scope]
+    modified = func.coalesce(model.updated_at, model.created_at)
+    return catalog_cache.get_version(scope, lambda: db.session.execute(
+        select(func.count(model.id), func.max(modified))
+    ).one())
+
+
+def _user_key():
+    return current_user.get_id() if current_user.is_authenticated else 'guest'
+
+
+def conditional(scope, per_user=False):
+    """Answer If-None-Match / If-Modified-Since for a catalog view with 304.
+
+    The validators come from catalog_version(scope), so an unchanged catalog
+    is answered before the view (and its template) runs. Views whose HTML
+    differs per visitor pass per_user=True: their ETag includes the user, and
+    only anonymous responses are marked cacheable by shared caches.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if request.method not in ('GET', 'HEAD') or not config['HTTP_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+            if per_user and session.get('_flashes'):
+                # A pending flash message makes this render one-off
+                response = make_response(view(*args, **kwargs))
+                response.cache_control.private = True
+                response.cache_control.no_store = True
+                return response
+
+            count, last_modified = catalog_version(scope)
+            user = _user_key() if per_user else ''
+            etag = hashlib.sha1(
+                f'{scope}:{count}:{last_modified}:{_templates_version}:{user}'.encode()
+            ).hexdigest()[:32]
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            if per_user:
+                response.vary.add('Cookie')
+            if per_user and user != 'guest' or 'Set-Cookie' in response.headers:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.public = True
+                response.cache_control.max_age = config['HTTP_CACHE_MAX_AGE']
+                response.cache_control.s_maxage = config['HTTP_CACHE_SHARED_MAX_AGE']
+            return response
+        return wrapper
+    return decorator
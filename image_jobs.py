@@ -0,0 +1,138 @@
+"""
+Background image rendition jobs on a process pool
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import click
+from image_service import (generate_renditions, image_key_for_original, image_size,
+                           rendition_url, renditions_exist)
+
+_executor = None
+_executor_lock = threading.Lock()
+_app = None
+
+
+def init_image_jobs(app):
+    """Register the job system and the reprocess-images CLI command"""
+    global _app
+    _app = app
+    app.config.setdefault('IMAGE_WORKERS', os.cpu_count() or 1)
+    app.cli.add_command(reprocess_images_command)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn keeps the app's threads and DB connections out of the children
+            _executor = ProcessPoolExecutor(
+                max_workers=_app.config['IMAGE_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _image_models():
+    from app import Painting, Exhibition
+    return {'painting': Painting, 'exhibition': Exhibition}
+
+
+def image_key_for(record):
+    """Rendition key of a record, taken from its stored original filename"""
+    return image_key_for_original(record.image_original)
+
+
+def _job_args(record):
+    folder = _app.config['UPLOAD_FOLDER']
+    return (os.path.join(folder, record.image_original), folder, image_key_for(record))
+
+
+def _finish(kind, record_id, image_key, result=None, error=None):
+    """Store a job's outcome on its record, unless the record has moved on to another image"""
+    from app import db
+    from catalog_cache import catalog_cache
+    with _app.app_context():
+        record = db.session.get(_image_models()[kind], record_id)
+        if record is None:
+            return
+        if record.image_original is None or image_key_for(record) != image_key:
+            # The image was replaced while this job ran; the newer job will store its own result
+            return
+        if error is not None:
+            print(f"Error processing image for {kind} {record_id}: {error}")
+            record.image_status = 'failed'
+        else:
+            record.image_key = image_key
+            record.image_width, record.image_height = result
+            record.image_url = rendition_url(image_key, 'full')
+            record.image_status = 'ready'
+        db.session.commit()
+        if kind == 'painting':
+            catalog_cache.invalidate_painting(record_id)
+        else:
+            catalog_cache.invalidate_exhibitions()
+
+
+def queue_renditions(kind, record):
+    """Generate renditions for a record's original upload off the request.
+
+    With IMAGE_WORKERS=0 the renditions are generated inline.
+    """
+    args = _job_args(record)
+    record_id, image_key = record.id, args[2]
+    if renditions_exist(args[1], image_key):
+        # Same content was uploaded before: reuse its renditions
+        _finish(kind, record_id, image_key, result=image_size(args[0]))
+        return
+    if not _app.config['IMAGE_WORKERS']:
+        try:
+            _finish(kind, record_id, image_key, result=generate_renditions(*args))
+        except Exception as e:
+            _finish(kind, record_id, image_key, error=e)
+        return
+
+    def done(future):
+        error = future.exception()
+        _finish(kind, record_id, image_key,
+                result=None if error else future.result(), error=error)
+
+    _get_executor().submit(generate_renditions, *args).add_done_callback(done)
+
+
+def image_status(kind, record_id):
+    """Current processing state of a record's image, or None if it doesn't exist"""
+    from app import db
+    record = db.session.get(_image_models()[kind], record_id)
+    if record is None:
+        return None
+    return {
+        'status': record.image_status,
+        'image_url': record.image_url,
+        'image_key': record.image_key,
+    }
+
+
+@click.command('reprocess-images')
+@click.option('--workers', type=int, default=None, help='Processes to use (default: all cores)')
+def reprocess_images_command(workers):
+    """Regenerate every rendition, e.g. after changing RENDITIONS."""
+    from app import db
+    jobs = []
+    for kind, model in _image_models().items():
+        for record in model.query.filter(model.image_original.isnot(None)).all():
+            jobs.append((kind, record.id, _job_args(record)))
+    click.echo(f'Reprocessing {len(jobs)} image(s)')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(generate_renditions, *args): (kind, record_id, args[2])
+                   for kind, record_id, args in jobs}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            kind, record_id, image_key = futures[future]
+            error = future.exception()
+            _finish(kind, record_id, image_key,
+                    result=None if error else future.result(), error=error)
+            click.echo(f'[{done_count}/{len(jobs)}] {kind} {record_id}: '
+                       f'{"failed" if error else "ok"}')
+    db.session.remove()
@@ -0,0 +1,131 @@
+"""
+Upload image processing: resized WebP/JPEG renditions and srcset helpers
+"""
+import os
+from upload_storage import media_url, store_upload
+
+# name -> maximum width in pixels, smallest first
+RENDITIONS = {
+    'thumb': 320,
+    'card': 640,
+    'detail': 1280,
+    'full': 2048,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Bump after changing RENDITIONS or FORMATS, then run `flask reprocess-images`;
+# rendition names include it so cached copies are never served stale
+RENDITIONS_VERSION = 1
+
+
+def rendition_filename(image_key, name, fmt):
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{image_key}_{name}.{ext}'
+
+
+def rendition_url(image_key, name, fmt='jpeg'):
+    return media_url(rendition_filename(image_key, name, fmt))
+
+
+def image_key_for_original(filename):
+    """Rendition key for a stored original: its content hash plus RENDITIONS_VERSION"""
+    stem = filename.split('_', 1)[0].rsplit('.', 1)[0]
+    return f'{stem}-v{RENDITIONS_VERSION}'
+
+
+def renditions_exist(upload_folder, image_key):
+    return all(os.path.exists(os.path.join(upload_folder, rendition_filename(image_key, name, fmt)))
+               for name in RENDITIONS for fmt in FORMATS)
+
+
+def image_size(path):
+    """(width, height) after EXIF orientation, read without decoding the pixels"""
+    from PIL import Image
+    with Image.open(path) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):  # rotated 90 or 270 degrees
+            width, height = height, width
+        return width, height
+
+
+def rendition_urls(image_key):
+    """{'webp': {name: url}, 'jpeg': {name: url}} for a processed image, or None"""
+    if not image_key:
+        return None
+    return {fmt: {name: rendition_url(image_key, name, fmt) for name in RENDITIONS}
+            for fmt in FORMATS}
+
+
+def _field(obj, name):
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def image_srcset(obj, fmt='jpeg'):
+    """srcset attribute value for a Painting/Exhibition (or its dict), '' if unprocessed"""
+    image_key = _field(obj, 'image_key')
+    if not image_key:
+        return ''
+    width = _field(obj, 'image_width')
+    entries = []
+    for name, max_width in RENDITIONS.items():
+        rendered_width = min(max_width, width) if width else max_width
+        entries.append(f'{rendition_url(image_key, name, fmt)} {rendered_width}w')
+        if width and width <= max_width:
+            break
+    return ', '.join(entries)
+
+
+def image_rendition(obj, name='card', fmt='jpeg'):
+    """URL of one rendition, falling back to image_url for unprocessed images"""
+    image_key = _field(obj, 'image_key')
+    if image_key:
+        return rendition_url(image_key, name, fmt)
+    return _field(obj, 'image_url')
+
+
+def generate_renditions(source_path, upload_folder, image_key):
+    """Write every rendition of source_path and return its (width, height).
+
+    EXIF orientation is applied and all metadata is dropped on re-encode.
+    """
+    from PIL import Image, ImageOps
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        width, height = image.size
+        for name, max_width in RENDITIONS.items():
+            resized = image
+            if width > max_width:
+                resized = image.resize((max_width, round(height * max_width / width)), Image.LANCZOS)
+            for fmt, (pil_format, options) in FORMATS.items():
+                path = os.path.join(upload_folder, rendition_filename(image_key, name, fmt))
+                resized.save(path, pil_format, **options)
+    return width, height
+
+
+def save_upload(file_storage, upload_folder):
+    """Store an uploaded image (deduplicated by content) as the original for renditions"""
+    return original_fields(store_upload(file_storage, upload_folder))
+
+
+def original_fields(filename):
+    """Model fields for a freshly stored original awaiting renditions.
+
+    Until the renditions are ready image_url points at the original and
+    image_key is unset.
+    """
+    return {
+        'image_url': media_url(filename),
+        'image_original': filename,
+        'image_key': None,
+        'image_width': None,
+        'image_height': None,
+        'image_status': 'processing',
+    }
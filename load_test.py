@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput and latency of the dev server versus the production server
+
+    python load_test.py --compare                 start both servers, test each, print a table
+    python load_test.py --url http://host:8000    test a server that is already running
+
+Each client thread keeps one keep-alive connection and requests the catalog
+pages in turn for --duration seconds. Run it against a database with a
+realistic catalog, on the machine that will serve production, and with
+HTTP_CACHE_SHARED_MAX_AGE as deployed; the numbers are only comparable
+between runs on the same machine.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+PATHS = ['/', '/paintings', '/gallery', '/api/paintings']
+RUN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run.py')
+
+
+def run_load(base_url, paths, concurrency, duration):
+    """Hammer base_url from concurrency threads; returns request count, errors, req/s and latency percentiles"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        session = requests.Session()
+        mine, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                response = session.get(base_url + paths[i % len(paths)], timeout=30)
+                if response.status_code >= 500:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            mine.append(time.monotonic() - started)
+            i += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(0.50),
+        'p99': percentile(0.99),
+    }
+
+
+def start_server(port, prod, workers=None):
+    command = [sys.executable, RUN_PY, 'serve', '--port', str(port)]
+    if prod:
+        command.append('--prod')
+        if workers:
+            command += ['--workers', str(workers)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    for _ in range(100):
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def stop_server(process):
+    # The dev server's reloader and gunicorn's workers are children; stop the whole group
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def print_results(rows):
+    print(f"{'server':<24} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, result in rows:
+        print(f"{name:<24} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+              f"{result['p50']:>8.1f} {result['p99']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Artist Portfolio application')
+    parser.add_argument('--url', help='Test this running server instead of starting servers')
+    parser.add_argument('--compare', action='store_true', help='Start and test the dev and production servers')
+    parser.add_argument('--concurrency', type=int, default=32, help='Client threads')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per server')
+    parser.add_argument('--workers', type=int, help='Production worker processes (default: sized from CPUs)')
+    parser.add_argument('--paths', default=','.join(PATHS), help='Comma-separated paths to cycle through')
+    args = parser.parse_args()
+    paths = args.paths.split(',')
+
+    if args.url:
+        print_results([(args.url, run_load(args.url.rstrip('/'), paths, args.concurrency, args.duration))])
+        return
+    if not args.compare:
+        parser.error('pass --url or --compare')
+
+    rows = []
+    for name, port, prod in (('dev server (run.py)', 5101, False), ('gunicorn (serve --prod)', 5102, True)):
+        process = start_server(port, prod, args.workers)
+        try:
+            rows.append((name, run_load(f'http://127.0.0.1:{port}', paths, args.concurrency, args.duration)))
+        finally:
+            stop_server(process)
+    print_results(rows)
+
+
+if __name__ == '__main__':
+    main()
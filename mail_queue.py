@@ -0,0 +1,202 @@
+"""
+Durable outbound email queue drained by a background worker pool
+"""
+import random
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+_wake = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+_app = None
+
+
+def _load_order(order_id):
+    from app import Order, order_items_loader
+    from email_service import snapshot_order
+    order = Order.query.options(order_items_loader()).filter_by(id=order_id).first()
+    return snapshot_order(order) if order else None
+
+
+def _load_contact(contact_id):
+    from app import Contact
+    from email_service import snapshot_contact
+    contact = Contact.query.get(contact_id)
+    return snapshot_contact(contact) if contact else None
+
+
+def _send_order_confirmation(order):
+    from email_service import send_order_confirmation
+    return send_order_confirmation(order, order['customer_email'])
+
+
+def _send_order_notification_to_admin(order):
+    from email_service import send_order_notification_to_admin
+    return send_order_notification_to_admin(order)
+
+
+def _send_contact_notification(contact):
+    from email_service import send_contact_notification
+    return send_contact_notification(contact)
+
+
+def _send_contact_confirmation(contact):
+    from email_service import send_contact_confirmation
+    return send_contact_confirmation(contact)
+
+
+# kind -> (loader, sender)
+EMAIL_KINDS = {
+    'order_confirmation': (_load_order, _send_order_confirmation),
+    'order_admin_notification': (_load_order, _send_order_notification_to_admin),
+    'contact_notification': (_load_contact, _send_contact_notification),
+    'contact_confirmation': (_load_contact, _send_contact_confirmation),
+}
+
+
+def init_mail_queue(app):
+    """Register the queue with the app; workers start on the first enqueue"""
+    global _app
+    _app = app
+    app.config.setdefault('MAIL_QUEUE_WORKERS', 2)
+    app.config.setdefault('MAIL_QUEUE_MAX_ATTEMPTS', 5)
+    app.config.setdefault('MAIL_QUEUE_BACKOFF', 30)
+    app.config.setdefault('MAIL_QUEUE_MAX_BACKOFF', 3600)
+    app.config.setdefault('MAIL_QUEUE_POLL_INTERVAL', 5)
+    app.config.setdefault('MAIL_QUEUE_BATCH_SIZE', 10)
+    app.config.setdefault('MAIL_QUEUE_LOCK_TIMEOUT', 300)
+
+    event.listen(app.extensions['sqlalchemy'].session, 'after_commit', _after_commit)
+
+
+def _after_commit(session):
+    if session.info.pop('mail_queued', False):
+        start_workers()
+        _wake.set()
+
+
+def queue_email(kind, ref_id):
+    """Add an email job to the current session; it is sent after commit"""
+    from app import db, OutboundEmail
+    if kind not in EMAIL_KINDS:
+        raise ValueError(f'Unknown email kind: {kind}')
+    job = OutboundEmail(kind=kind, ref_id=ref_id)
+    db.session.add(job)
+    db.session.info['mail_queued'] = True
+    return job
+
+
+def start_workers():
+    """Start the worker pool if it is not already running"""
+    if _app is None:
+        return
+    with _workers_lock:
+        _workers[:] = [t for t in _workers if t.is_alive()]
+        for i in range(len(_workers), _app.config['MAIL_QUEUE_WORKERS']):
+            worker = threading.Thread(target=_worker_loop, args=(_app,),
+                                      name=f'mail-queue-{i}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def _worker_loop(app):
+    while True:
+        processed = 0
+        with app.app_context():
+            try:
+                processed = process_pending()
+            except Exception as e:
+                print(f"Mail queue worker error: {e}")
+                from app import db
+                db.session.rollback()
+        if not processed:
+            _wake.wait(app.config['MAIL_QUEUE_POLL_INTERVAL'])
+            _wake.clear()
+
+
+def _backoff(attempts, config):
+    delay = min(config['MAIL_QUEUE_BACKOFF'] * 2 ** (attempts - 1),
+                config['MAIL_QUEUE_MAX_BACKOFF'])
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _release_stale_locks(now, config):
+    from app import db, OutboundEmail
+    cutoff = now - timedelta(seconds=config['MAIL_QUEUE_LOCK_TIMEOUT'])
+    OutboundEmail.query.filter(
+        OutboundEmail.status == 'sending',
+        OutboundEmail.locked_at < cutoff
+    ).update({'status': 'pending', 'locked_at': None}, synchronize_session=False)
+    db.session.commit()
+
+
+def _claim(job_id, now):
+    from app import db, OutboundEmail
+    claimed = OutboundEmail.query.filter(
+        OutboundEmail.id == job_id,
+        OutboundEmail.status == 'pending',
+        OutboundEmail.next_attempt_at <= now
+    ).update({'status': 'sending', 'locked_at': now}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def process_pending():
+    """Claim and deliver one batch of due emails, returning how many were handled"""
+    from flask import current_app
+    from app import db, OutboundEmail
+    config = current_app.config
+    now = datetime.utcnow()
+    _release_stale_locks(now, config)
+
+    due = db.session.query(OutboundEmail.id).filter(
+        OutboundEmail.status == 'pending',
+        OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.next_attempt_at).limit(config['MAIL_QUEUE_BATCH_SIZE']).all()
+
+    handled = 0
+    for (job_id,) in due:
+        if not _claim(job_id, now):
+            continue
+        job = OutboundEmail.query.get(job_id)
+        loader, sender = EMAIL_KINDS.get(job.kind, (None, None))
+        error = None
+        if loader is None:
+            error = f'Unknown email kind: {job.kind}'
+        else:
+            record = loader(job.ref_id)
+            if record is None:
+                error = f'{job.kind} target {job.ref_id} no longer exists'
+            elif not sender(record):
+                error = 'Send failed'
+
+        job.attempts += 1
+        job.locked_at = None
+        if error is None:
+            job.status = 'sent'
+            job.sent_at = datetime.utcnow()
+            job.last_error = None
+        elif loader is None or record is None or job.attempts >= config['MAIL_QUEUE_MAX_ATTEMPTS']:
+            job.status = 'dead'
+            job.last_error = error
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + _backoff(job.attempts, config)
+            job.last_error = error
+        db.session.commit()
+        handled += 1
+    return handled
+
+
+def retry_dead(job_id=None):
+    """Move dead-lettered emails back to the queue"""
+    from app import db, OutboundEmail
+    query = OutboundEmail.query.filter_by(status='dead')
+    if job_id is not None:
+        query = query.filter_by(id=job_id)
+    count = query.update({'status': 'pending', 'attempts': 0,
+                          'next_attempt_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.info['mail_queued'] = True
+    db.session.commit()
+    return count
@@ -0,0 +1,75 @@
+"""hot path indexes; bring database_schema.sql databases up to the models
+
+Revision ID: 0b81416a5d9f
+Revises: a4d17e3b62c8
+Create Date: 2026-10-17 19:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b81416a5d9f'
+down_revision = 'a4d17e3b62c8'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, options) matching the models' __table_args__
+INDEXES = [
+    ('ix_painting_available_created_at', 'painting', ['created_at', 'id'],
+     {'postgresql_where': sa.text('available'), 'sqlite_where': sa.text('available = 1')}),
+    ('ix_painting_featured', 'painting', ['created_at'],
+     {'postgresql_where': sa.text('featured'), 'sqlite_where': sa.text('featured = 1')}),
+    ('ix_painting_created_at_id', 'painting', ['created_at', 'id'], {}),
+    ('ix_exhibition_created_at_id', 'exhibition', ['created_at', 'id'], {}),
+    ('ix_order_user_id_created_at', 'order', ['user_id', 'created_at'], {}),
+    ('ix_order_created_at_id', 'order', ['created_at', 'id'], {}),
+    ('ix_order_item_order_id', 'order_item', ['order_id'], {}),
+    ('ix_contact_created_at_id', 'contact', ['created_at', 'id'], {}),
+    ('uq_cart_user_id_painting_id', 'cart', ['user_id', 'painting_id'], {'unique': True}),
+    ('uq_cart_session_id_painting_id', 'cart', ['session_id', 'painting_id'], {'unique': True}),
+    ('uq_wishlist_user_id_painting_id', 'wishlist', ['user_id', 'painting_id'], {'unique': True}),
+    ('uq_wishlist_session_id_painting_id', 'wishlist', ['session_id', 'painting_id'], {'unique': True}),
+]
+
+# Single-column indexes from database_schema.sql that the composites above replace
+SUPERSEDED = [
+    ('idx_painting_available', 'painting'),
+    ('idx_painting_created_at', 'painting'),
+    ('idx_order_created_at', 'order'),
+    ('idx_contact_created_at', 'contact'),
+    ('idx_exhibition_created_at', 'exhibition'),
+]
+
+
+def upgrade():
+    # database_schema.sql's order table predates customer accounts
+    order_columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('order')]
+    if 'user_id' not in order_columns:
+        with op.batch_alter_table('order') as batch_op:
+            batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_order_user_id', 'user', ['user_id'], ['id'])
+
+    # Keep the oldest row per owner and painting so the unique indexes can be built
+    for table in ('cart', 'wishlist'):
+        for owner in ('user_id', 'session_id'):
+            op.execute(
+                f'DELETE FROM {table} WHERE {owner} IS NOT NULL AND id NOT IN ('
+                f'SELECT MIN(id) FROM {table} WHERE {owner} IS NOT NULL GROUP BY {owner}, painting_id)'
+            )
+
+    for name, table, columns, options in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True, **options)
+    for name, table in SUPERSEDED:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+
+def downgrade():
+    for name, table, columns, options in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.create_index('idx_painting_available', 'painting', ['available'], if_not_exists=True)
+    op.create_index('idx_painting_created_at', 'painting', ['created_at'], if_not_exists=True)
+    op.create_index('idx_order_created_at', 'order', ['created_at'], if_not_exists=True)
+    op.create_index('idx_contact_created_at', 'contact', ['created_at'], if_not_exists=True)
+    op.create_index('idx_exhibition_created_at', 'exhibition', ['created_at'], if_not_exists=True)
@@ -0,0 +1,38 @@
+"""background image job columns on painting and exhibition
+
+Revision ID: 1d6a92e4b0f7
+Revises: c83f5a0d7e21
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6a92e4b0f7'
+down_revision = 'c83f5a0d7e21'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('image_original', sa.String(length=500)),
+    ('image_status', sa.String(length=20)),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in ('painting', 'exhibition'):
+        existing = [column['name'] for column in inspector.get_columns(table)]
+        with op.batch_alter_table(table) as batch_op:
+            for name, type_ in COLUMNS:
+                if name not in existing:
+                    batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade():
+    for table in ('painting', 'exhibition'):
+        with op.batch_alter_table(table) as batch_op:
+            for name, type_ in reversed(COLUMNS):
+                batch_op.drop_column(name)
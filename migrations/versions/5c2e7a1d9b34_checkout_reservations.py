@@ -0,0 +1,35 @@
+"""checkout reservations
+
+Revision ID: 5c2e7a1d9b34
+Revises: 0b81416a5d9f
+Create Date: 2026-10-17 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e7a1d9b34'
+down_revision = '0b81416a5d9f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'reservation' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'reservation',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('painting_id', sa.Integer(), sa.ForeignKey('painting.id'), nullable=False, unique=True),
+        sa.Column('owner', sa.String(length=120), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_reservation_expires_at', 'reservation', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_reservation_expires_at', table_name='reservation', if_exists=True)
+    op.drop_table('reservation')
@@ -0,0 +1,42 @@
+"""outbound email queue
+
+Revision ID: 7e9b04c1f2a6
+Revises: 5c2e7a1d9b34
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e9b04c1f2a6'
+down_revision = '5c2e7a1d9b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'outbound_email' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'outbound_email',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_outbound_email_status', 'outbound_email', ['status'])
+    op.create_index('ix_outbound_email_next_attempt_at', 'outbound_email', ['next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_outbound_email_next_attempt_at', table_name='outbound_email', if_exists=True)
+    op.drop_index('ix_outbound_email_status', table_name='outbound_email', if_exists=True)
+    op.drop_table('outbound_email')
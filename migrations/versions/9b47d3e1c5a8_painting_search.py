@@ -0,0 +1,37 @@
+"""painting full-text search: tsvector column and GIN index, or FTS5 table and triggers
+
+Revision ID: 9b47d3e1c5a8
+Revises: f25c8b7a3e90
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '9b47d3e1c5a8'
+down_revision = 'f25c8b7a3e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    # The DDL is IF NOT EXISTS throughout, so databases made by db.create_all() are left alone
+    create_search_index(connection)
+    if connection.dialect.name == 'sqlite':
+        # FTS5 external-content tables start empty; index the paintings already there
+        op.execute("INSERT INTO painting_fts (painting_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS idx_painting_search')
+        op.execute('ALTER TABLE painting DROP COLUMN IF EXISTS search_vector')
+    else:
+        for trigger in ('painting_fts_insert', 'painting_fts_delete', 'painting_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS painting_fts')
@@ -0,0 +1,122 @@
+"""initial schema: the tables as they stood before migrations were introduced
+
+Revision ID: a4d17e3b62c8
+Revises:
+Create Date: 2026-10-17 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d17e3b62c8'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _owner_table(name):
+    op.create_table(
+        name,
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('session_id', sa.String(length=100), nullable=True),
+        sa.Column('painting_id', sa.Integer(), sa.ForeignKey('painting.id'), nullable=False),
+        *([sa.Column('quantity', sa.Integer(), nullable=True)] if name == 'cart' else []),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def upgrade():
+    # Databases made by db.create_all() or database_schema.sql already have some
+    # or all of these; only the missing ones are created
+    tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'admin' not in tables:
+        op.create_table(
+            'admin',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(length=100), nullable=False, unique=True),
+            sa.Column('email', sa.String(length=200), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(length=200), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'user' not in tables:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=200), nullable=False, unique=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'painting' not in tables:
+        op.create_table(
+            'painting',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('category', sa.String(length=100), nullable=False),
+            sa.Column('price', sa.Numeric(10, 2), nullable=False),
+            sa.Column('size', sa.String(length=100), nullable=True),
+            sa.Column('medium', sa.String(length=100), nullable=True),
+            sa.Column('year', sa.Integer(), nullable=True),
+            sa.Column('image_url', sa.String(length=500), nullable=True),
+            sa.Column('available', sa.Boolean(), nullable=True),
+            sa.Column('featured', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'exhibition' not in tables:
+        op.create_table(
+            'exhibition',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('venue', sa.String(length=200), nullable=True),
+            sa.Column('date', sa.String(length=100), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('image_url', sa.String(length=500), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'order' not in tables:
+        op.create_table(
+            'order',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('order_number', sa.String(length=100), nullable=False, unique=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+            sa.Column('customer_name', sa.String(length=200), nullable=False),
+            sa.Column('customer_email', sa.String(length=200), nullable=False),
+            sa.Column('customer_phone', sa.String(length=50), nullable=True),
+            sa.Column('shipping_address', sa.Text(), nullable=True),
+            sa.Column('total_amount', sa.Numeric(10, 2), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'order_item' not in tables:
+        op.create_table(
+            'order_item',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('order_id', sa.Integer(), sa.ForeignKey('order.id'), nullable=False),
+            sa.Column('painting_id', sa.Integer(), sa.ForeignKey('painting.id'), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=True),
+            sa.Column('price', sa.Numeric(10, 2), nullable=False),
+        )
+    if 'contact' not in tables:
+        op.create_table(
+            'contact',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('email', sa.String(length=200), nullable=False),
+            sa.Column('subject', sa.String(length=300), nullable=True),
+            sa.Column('message', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    # database_schema.sql predates customer accounts, carts and wishlists
+    for name in ('cart', 'wishlist'):
+        if name not in tables:
+            _owner_table(name)
+
+
+def downgrade():
+    for name in ('wishlist', 'cart', 'contact', 'order_item', 'order', 'exhibition', 'painting', 'user', 'admin'):
+        op.drop_table(name)
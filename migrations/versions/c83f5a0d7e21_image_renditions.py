@@ -0,0 +1,39 @@
+"""image rendition columns on painting and exhibition
+
+Revision ID: c83f5a0d7e21
+Revises: 7e9b04c1f2a6
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83f5a0d7e21'
+down_revision = '7e9b04c1f2a6'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('image_key', sa.String(length=64)),
+    ('image_width', sa.Integer()),
+    ('image_height', sa.Integer()),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in ('painting', 'exhibition'):
+        existing = [column['name'] for column in inspector.get_columns(table)]
+        with op.batch_alter_table(table) as batch_op:
+            for name, type_ in COLUMNS:
+                if name not in existing:
+                    batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade():
+    for table in ('painting', 'exhibition'):
+        with op.batch_alter_table(table) as batch_op:
+            for name, type_ in reversed(COLUMNS):
+                batch_op.drop_column(name)
@@ -0,0 +1,33 @@
+"""updated_at on painting and exhibition for conditional GETs
+
+Revision ID: f25c8b7a3e90
+Revises: 1d6a92e4b0f7
+Create Date: 2026-10-18 09:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f25c8b7a3e90'
+down_revision = '1d6a92e4b0f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in ('painting', 'exhibition'):
+        # database_schema.sql already gave painting an updated_at column
+        if 'updated_at' in [column['name'] for column in inspector.get_columns(table)]:
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL')
+
+
+def downgrade():
+    for table in ('painting', 'exhibition'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
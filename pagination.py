@@ -0,0 +1,70 @@
+"""
+Keyset (created_at, id) pagination helpers
+"""
+import base64
+from datetime import datetime
+from flask import request, url_for, current_app
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, id):
+    """Opaque cursor pointing just past the given row"""
+    raw = f'{created_at.isoformat()}|{id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or invalid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_args(default=None):
+    """Read cursor and limit from the query string, clamping limit to MAX_PAGE_SIZE"""
+    default = default or current_app.config['PAGE_SIZE']
+    limit = request.args.get('limit', default, type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    return request.args.get('cursor') or None, limit
+
+
+def keyset_page(query, model, cursor, limit):
+    """Newest-first page of query results after cursor.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, id = position
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def next_page_url(next_cursor):
+    """URL of the current view with the cursor advanced, or None on the last page"""
+    if not next_cursor:
+        return None
+    args = request.args.to_dict(flat=False)  # keep repeated facet params
+    args['cursor'] = next_cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def first_page_url():
+    """URL of the current view without a cursor, or None when already on the first page"""
+    if not request.args.get('cursor'):
+        return None
+    args = request.args.to_dict(flat=False)
+    args.pop('cursor')
+    return url_for(request.endpoint, **request.view_args, **args)
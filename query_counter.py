@@ -0,0 +1,70 @@
+"""
+Query counting helpers for catching N+1 lazy loads
+"""
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+class QueryCountExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+def _engine(engine):
+    if engine is not None:
+        return engine
+    from flask import current_app
+    return current_app.extensions['sqlalchemy'].engine
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Count the SQL statements executed inside the block"""
+    engine = _engine(engine)
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Raise QueryCountExceeded if the block runs more than limit statements"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise QueryCountExceeded(f'{counter.count} queries executed, expected at most {limit}:\n{statements}')
+
+
+def init_query_counter(app):
+    """Warn about requests that run more than QUERY_COUNT_WARN statements (0 disables)"""
+    threshold = app.config.get('QUERY_COUNT_WARN', 0)
+    if not threshold:
+        return
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    with app.app_context():
+        event.listen(_engine(None), 'before_cursor_execute', on_execute)
+
+    @app.after_request
+    def warn_query_count(response):
+        count = g.get('query_count', 0)
+        if count > threshold:
+            print(f"Warning: {request.method} {request.path} ran {count} queries")
+        return response
@@ -0,0 +1,79 @@
+"""
+EXPLAIN check that the hot query paths are served by indexes, not table scans
+"""
+from datetime import datetime
+import click
+from sqlalchemy import and_, or_, text
+
+
+def hot_queries():
+    """(name, ORM query) for each access path the storefront and admin hit per request"""
+    from app import Painting, Exhibition, Order, OrderItem, Contact, Cart, Wishlist
+    since = datetime(2024, 1, 1)
+    newest_first = (Painting.created_at.desc(), Painting.id.desc())
+    return [
+        ('paintings page', Painting.query.filter_by(available=True).order_by(*newest_first).limit(25)),
+        ('paintings next page', Painting.query.filter_by(available=True).filter(or_(
+            Painting.created_at < since, and_(Painting.created_at == since, Painting.id < 100)
+        )).order_by(*newest_first).limit(25)),
+        ('featured paintings', Painting.query.filter_by(featured=True).limit(6)),
+        ('admin paintings', Painting.query.order_by(*newest_first).limit(51)),
+        ('gallery', Exhibition.query.order_by(Exhibition.created_at.desc(), Exhibition.id.desc()).limit(25)),
+        ('cart by user', Cart.query.filter_by(user_id=1)),
+        ('cart item by user', Cart.query.filter_by(user_id=1, painting_id=1)),
+        ('cart by session', Cart.query.filter_by(session_id='s')),
+        ('cart item by session', Cart.query.filter_by(session_id='s', painting_id=1)),
+        ('wishlist by user', Wishlist.query.filter_by(user_id=1)),
+        ('wishlist item by user', Wishlist.query.filter_by(user_id=1, painting_id=1)),
+        ('wishlist by session', Wishlist.query.filter_by(session_id='s')),
+        ('wishlist item by session', Wishlist.query.filter_by(session_id='s', painting_id=1)),
+        ('my orders', Order.query.filter_by(user_id=1).order_by(Order.created_at.desc())),
+        ('order items', OrderItem.query.filter(OrderItem.order_id.in_([1, 2, 3]))),
+        ('admin orders', Order.query.order_by(Order.created_at.desc(), Order.id.desc()).limit(51)),
+        ('admin contacts', Contact.query.order_by(Contact.created_at.desc(), Contact.id.desc()).limit(51)),
+    ]
+
+
+def _plan(connection, sql):
+    if connection.dialect.name == 'postgresql':
+        return [row[0] for row in connection.execute(text(f'EXPLAIN {sql}'))]
+    return [row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def _is_table_scan(line):
+    # PostgreSQL: "Seq Scan on cart"; SQLite: "SCAN cart" (index scans say "USING ... INDEX")
+    return 'Seq Scan' in line or (line.startswith('SCAN ') and 'INDEX' not in line)
+
+
+def check_query_plans():
+    """{name: plan lines} for every hot query whose plan contains a table scan"""
+    from app import db
+    failures = {}
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Small tables make seq scans cheapest; this asks whether an index *can* serve the query
+            connection.execute(text('SET enable_seqscan = off'))
+        for name, query in hot_queries():
+            sql = query.statement.compile(connection, compile_kwargs={'literal_binds': True})
+            plan = _plan(connection, sql)
+            if any(_is_table_scan(line.strip()) for line in plan):
+                failures[name] = plan
+        connection.rollback()
+    return failures
+
+
+@click.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN each hot query and fail if any falls back to a table scan."""
+    failures = check_query_plans()
+    for name, plan in failures.items():
+        click.echo(f'{name}: table scan')
+        for line in plan:
+            click.echo(f'    {line}')
+    if failures:
+        raise SystemExit(1)
+    click.echo(f'{len(hot_queries())} hot queries use indexes')
+
+
+def init_query_plans(app):
+    app.cli.add_command(check_query_plans_command)
@@ -0,0 +1,223 @@
+"""
+Short holds on one-of-a-kind paintings while a buyer checks out
+
+A hold is a reservation row keyed by painting_id, claimed with one
+INSERT ... SELECT ... ON CONFLICT statement that only takes paintings that are
+still available and not held by someone else (or whose hold has expired). On
+PostgreSQL the SELECT locks the painting rows FOR UPDATE SKIP LOCKED, so a
+checkout never queues behind another one racing for the same painting: it
+treats the painting as taken and fails fast. Selling flips
+Painting.available in the same transaction as the order.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import DateTime, String, delete, event, func, literal, or_, select, update
+from cart_store import _insert
+
+_app = None
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def init_reservations(app):
+    global _app
+    _app = app
+    app.config.setdefault('RESERVATION_TTL', 600)
+    app.config.setdefault('RESERVATION_REAP_INTERVAL', 60)
+    session = app.extensions['sqlalchemy'].session
+    event.listen(session, 'after_commit', _after_commit)
+    event.listen(session, 'after_soft_rollback', _after_rollback)
+    app.cli.add_command(reap_reservations_command)
+    app.cli.add_command(stress_checkout_command)
+
+
+def _after_commit(session):
+    sold = session.info.pop('sold_paintings', None)
+    if sold:
+        from catalog_cache import catalog_cache
+        for painting_id in sold:
+            catalog_cache.invalidate_painting(painting_id)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('sold_paintings', None)
+
+
+def reservation_owner(user_id, session_id):
+    """Owner key for the cart owner returned by cart_owner()"""
+    return f'user:{user_id}' if user_id else f'session:{session_id}'
+
+
+def reserve(owner, painting_ids, ttl=None):
+    """Hold (or extend the owner's hold on) each available painting for ttl seconds.
+
+    Runs in the current transaction; the caller commits. Returns the set of
+    painting ids now held by owner; the rest are sold, missing or held by
+    another buyer.
+    """
+    from app import db, Painting, Reservation
+    if not painting_ids:
+        return set()
+    start_reaper()
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl or _app.config['RESERVATION_TTL'])
+    available = select(
+        Painting.id,
+        literal(owner, String),
+        literal(expires_at, DateTime),
+        literal(now, DateTime),
+    ).where(Painting.id.in_(list(painting_ids)), Painting.available == True).with_for_update(skip_locked=True)
+    insert = _insert(Reservation).from_select(['painting_id', 'owner', 'expires_at', 'created_at'], available)
+    statement = insert.on_conflict_do_update(
+        index_elements=['painting_id'],
+        set_={'owner': insert.excluded.owner, 'expires_at': insert.excluded.expires_at},
+        where=or_(Reservation.expires_at <= now, Reservation.owner == insert.excluded.owner),
+    ).returning(Reservation.painting_id)
+    return set(db.session.execute(statement).scalars())
+
+
+def release(owner, painting_ids=None):
+    """Drop the owner's holds (all of them when painting_ids is None); the caller commits"""
+    from app import db, Reservation
+    statement = delete(Reservation).where(Reservation.owner == owner)
+    if painting_ids is not None:
+        statement = statement.where(Reservation.painting_id.in_(list(painting_ids)))
+    db.session.execute(statement)
+
+
+def sell(owner, painting_ids):
+    """Mark the owner's held paintings unavailable and drop their holds.
+
+    Runs in the current transaction; the catalog cache is invalidated after
+    commit. Returns the set of painting ids sold; any other id had no live
+    hold by owner and was left untouched.
+    """
+    from app import db, Painting, Reservation
+    held = select(Reservation.painting_id).where(
+        Reservation.owner == owner, Reservation.expires_at > datetime.utcnow()
+    )
+    sold = set(db.session.execute(
+        update(Painting)
+        .where(Painting.id.in_(list(painting_ids)), Painting.available == True, Painting.id.in_(held))
+        .values(available=False)
+        .returning(Painting.id)
+    ).scalars())
+    if sold:
+        db.session.execute(delete(Reservation).where(Reservation.painting_id.in_(list(sold))))
+        db.session.info.setdefault('sold_paintings', set()).update(sold)
+    return sold
+
+
+def reap_expired():
+    """Delete expired holds, returning how many were removed"""
+    from app import db, Reservation
+    result = db.session.execute(delete(Reservation).where(Reservation.expires_at <= datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount
+
+
+def start_reaper():
+    """Start the background reaper if it is not already running"""
+    global _reaper
+    if _app is None or not _app.config['RESERVATION_REAP_INTERVAL']:
+        return
+    with _reaper_lock:
+        if _reaper is None or not _reaper.is_alive():
+            _reaper = threading.Thread(target=_reaper_loop, args=(_app,),
+                                       name='reservation-reaper', daemon=True)
+            _reaper.start()
+
+
+def _reaper_loop(app):
+    while True:
+        time.sleep(app.config['RESERVATION_REAP_INTERVAL'])
+        with app.app_context():
+            try:
+                reap_expired()
+            except Exception as e:
+                print(f"Reservation reaper error: {e}")
+                from app import db
+                db.session.rollback()
+
+
+@click.command('reap-reservations')
+def reap_reservations_command():
+    """Delete expired checkout holds."""
+    click.echo(f'Removed {reap_expired()} expired reservations')
+
+
+@click.command('stress-checkout')
+@click.option('--buyers', default=300, help='Parallel checkouts to attempt.')
+@click.option('--paintings', default=40, help='Throwaway paintings they compete for.')
+@click.option('--cart-size', default=2, help='Paintings per checkout.')
+@click.option('--threads', default=32, help='Worker threads.')
+def stress_checkout_command(buyers, paintings, cart_size, threads):
+    """Race many checkouts for a few paintings and verify none is sold twice.
+
+    Creates throwaway paintings, runs the checkouts through place_order on
+    worker threads, checks that every painting was ordered at most once and
+    that everything ordered is now unavailable, then deletes what it created.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from app import db, Painting, Order, OrderItem, Reservation
+    from checkout import place_order, CheckoutError
+
+    pool = [Painting(title=f'Stress {i}', category='Stress test', price=100) for i in range(paintings)]
+    db.session.add_all(pool)
+    db.session.commit()
+    painting_ids = [painting.id for painting in pool]
+    app = _app
+
+    def checkout(buyer):
+        cart = random.sample(painting_ids, min(cart_size, len(painting_ids)))
+        with app.app_context():
+            try:
+                place_order({'name': f'Buyer {buyer}', 'email': f'buyer{buyer}@example.com'},
+                            [{'id': painting_id, 'quantity': 1} for painting_id in cart],
+                            owner=f'stress:{buyer}')
+                db.session.commit()
+                return 'sold'
+            except CheckoutError:
+                db.session.rollback()
+                return 'taken'
+            except Exception as e:
+                db.session.rollback()
+                return f'error: {e.__class__.__name__}'
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outcomes = list(executor.map(checkout, range(buyers)))
+    elapsed = time.perf_counter() - started
+
+    try:
+        sales = dict(db.session.execute(
+            select(OrderItem.painting_id, func.count(OrderItem.id))
+            .where(OrderItem.painting_id.in_(painting_ids)).group_by(OrderItem.painting_id)
+        ).all())
+        double_sold = {painting_id: count for painting_id, count in sales.items() if count > 1}
+        still_available = db.session.execute(
+            select(func.count(Painting.id)).where(Painting.id.in_(list(sales)), Painting.available == True)
+        ).scalar()
+
+        for outcome in sorted(set(outcomes)):
+            click.echo(f'{outcome}: {outcomes.count(outcome)}')
+        click.echo(f'{buyers} checkouts in {elapsed:.2f}s ({buyers / elapsed:.0f}/s); '
+                   f'{len(sales)} of {paintings} paintings sold')
+        if double_sold:
+            click.echo(f'Double-sold paintings: {double_sold}')
+        if still_available:
+            click.echo(f'{still_available} sold paintings are still marked available')
+    finally:
+        orders = db.session.execute(
+            select(OrderItem.order_id).where(OrderItem.painting_id.in_(painting_ids))
+        ).scalars().all()
+        db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(orders)))
+        db.session.execute(delete(Order).where(Order.id.in_(orders)))
+        db.session.execute(delete(Reservation).where(Reservation.painting_id.in_(painting_ids)))
+        db.session.execute(delete(Painting).where(Painting.id.in_(painting_ids)))
+        db.session.commit()
+    if double_sold or still_available:
+        raise SystemExit(1)
@@ -1,15 +1,125 @@
 #!/usr/bin/env python3
 """
 Simple run script for the Artist Portfolio application
+
+    python run.py                 Werkzeug dev server with debugger and reloader
+    python run.py serve --prod    gunicorn: preloaded app, one worker process per
+                                  core (2 x CPUs + 1), recycled every
+                                  GUNICORN_MAX_REQUESTS requests; uses the
+                                  production config profile unless APP_CONFIG
+                                  names another
+
+In production, `kill -HUP <pid>` gracefully replaces the workers with the same
+code; for new code, `kill -USR2 <pid>` starts a second master alongside the old
+one, after which `kill -QUIT <old pid>` retires the old master with no dropped
+connections. The master's pid is written to --pid.
 """
 
+import argparse
 import os
 import sys
-from app import app
 from dotenv import load_dotenv
 load_dotenv()
+
+# gevent is left out: the DB pool is sized per thread and psycopg2 blocks the
+# whole worker unless patched with psycogreen
+WORKER_CLASSES = ('sync', 'gthread')
+
+
+def production_options(args):
+    """gunicorn settings, sized from the CPU count unless overridden"""
+    cpus = os.cpu_count() or 1
+    worker_class = args.worker_class or os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+    return {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers or int(os.getenv('WEB_CONCURRENCY', 2 * cpus + 1)),
+        'worker_class': worker_class,
+        'threads': int(os.getenv('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)),
+        'preload_app': True,
+        'max_requests': int(os.getenv('GUNICORN_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100)),  # don't recycle all at once
+        'timeout': int(os.getenv('GUNICORN_TIMEOUT', 30)),  # seconds before a stuck worker is killed
+        'graceful_timeout': int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30)),  # seconds to finish on reload
+        'keepalive': int(os.getenv('GUNICORN_KEEPALIVE', 5)),  # seconds; > the load balancer's idle timeout
+        'pidfile': args.pid,
+        'accesslog': os.getenv('GUNICORN_ACCESS_LOG'),
+        'errorlog': '-',
+        'post_fork': _post_fork,
+    }
+
+
+def production_app(args):
+    """The app built with the production profile, its pool sized to each worker's threads"""
+    os.environ.setdefault('APP_CONFIG', 'production')
+    from app import create_app
+    overrides = {}
+    if 'DB_POOL_SIZE' not in os.environ:
+        # One connection per request a worker serves at once; DB_MAX_OVERFLOW covers background threads
+        overrides['DB_POOL_SIZE'] = production_options(args)['threads']
+    return create_app(overrides)
+
+
+def _post_fork(server, worker):
+    # The preloaded app may have opened connections in the master; each worker needs its own
+    from app import db
+    from db_pool import pool_stats
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+    pool_stats.reset()
+
+
+def serve_production(args, app):
+    """Run the app under gunicorn's pre-forking master"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("Error: production mode requires gunicorn (pip install gunicorn)")
+        sys.exit(1)
+
+    options = production_options(args)
+    if options['worker_class'] not in WORKER_CLASSES:
+        print(f"Error: GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}")
+        sys.exit(1)
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    print(f"🎨 Starting Artist Portfolio Application (gunicorn, {options['workers']} "
+          f"{options['worker_class']} workers on {options['bind']})...")
+    ProductionServer().run()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Artist Portfolio application')
+    commands = parser.add_subparsers(dest='command')
+    serve = commands.add_parser('serve', help='Run the web server')
+    serve.add_argument('--prod', action='store_true', help='gunicorn instead of the dev server')
+    serve.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    serve.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    serve.add_argument('--workers', type=int, help='Worker processes (default: WEB_CONCURRENCY or 2 x CPUs + 1)')
+    serve.add_argument('--worker-class', choices=WORKER_CLASSES,
+                       help='sync for CPU-bound pages; gthread for many slow clients')
+    serve.add_argument('--pid', default=os.getenv('GUNICORN_PID_FILE'), help='Write the master pid here')
+    return parser.parse_args(argv)
+
+
 def main():
     """Main entry point for the application"""
+    args = parse_args()
+    prod = args.command == 'serve' and args.prod
+    if prod:
+        app = production_app(args)
+    else:
+        from app import create_app
+        app = create_app()
+    host = getattr(args, 'host', '0.0.0.0')
+    port = getattr(args, 'port', 5000)
     
     # Check if virtual environment is activated
     if not hasattr(sys, 'real_prefix') and not (
@@ -32,16 +142,20 @@ def main():
         os.makedirs(upload_dir)
         print(f"✅ Created uploads directory: {upload_dir}")
     
+    if prod:
+        serve_production(args, app)
+        return
+    
     print("🎨 Starting Artist Portfolio Application...")
-    print("📍 Admin Panel: http://127.0.0.1:5000/admin")
+    print(f"📍 Admin Panel: http://127.0.0.1:{port}/admin")
     print("🔑 Default Login: admin / admin123")
     print("⚠️  Remember to change default password!")
     print()
     
     # Run the application
     app.run(
-        host='0.0.0.0',
-        port=5000,
+        host=host,
+        port=port,
         debug=True
     )
 
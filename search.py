@@ -0,0 +1,194 @@
+"""
+Full-text painting search: a GIN-indexed tsvector on PostgreSQL, FTS5 on SQLite
+"""
+import base64
+import click
+from markupsafe import escape
+from sqlalchemy import and_, column, event, func, literal_column, or_, select, table, text
+
+# Highlight markers that can't occur in painting text; escaped then turned into <mark>
+START_SEL = '\ue000'
+STOP_SEL = '\ue001'
+
+POSTGRES_DDL = [
+    # Weighted so title matches outrank category, medium/year and then description
+    """ALTER TABLE painting ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (
+           setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+           setweight(to_tsvector('english', coalesce(medium, '') || ' ' || coalesce(year::text, '')), 'C') ||
+           setweight(to_tsvector('english', coalesce(description, '')), 'D')
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS idx_painting_search ON painting USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS painting_fts USING fts5(
+           title, description, medium, category, year,
+           content='painting', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS painting_fts_insert AFTER INSERT ON painting BEGIN
+           INSERT INTO painting_fts (rowid, title, description, medium, category, year)
+           VALUES (new.id, new.title, new.description, new.medium, new.category, new.year);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS painting_fts_delete AFTER DELETE ON painting BEGIN
+           INSERT INTO painting_fts (painting_fts, rowid, title, description, medium, category, year)
+           VALUES ('delete', old.id, old.title, old.description, old.medium, old.category, old.year);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS painting_fts_update AFTER UPDATE ON painting BEGIN
+           INSERT INTO painting_fts (painting_fts, rowid, title, description, medium, category, year)
+           VALUES ('delete', old.id, old.title, old.description, old.medium, old.category, old.year);
+           INSERT INTO painting_fts (rowid, title, description, medium, category, year)
+           VALUES (new.id, new.title, new.description, new.medium, new.category, new.year);
+       END""",
+]
+
+def is_search_object(object, name, type_):
+    """True for the schema objects create_search_index() adds outside the models"""
+    if type_ == 'table':
+        return name == 'painting_fts' or name.startswith('painting_fts_')  # FTS5 shadow tables too
+    if type_ == 'column':
+        return name == 'search_vector' and object.table.name == 'painting'
+    if type_ == 'index':
+        return name == 'idx_painting_search'
+    return False
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def create_search_index(connection):
+    """Create the search column/table, its index and triggers if missing"""
+    name = _dialect(connection)
+    statements = POSTGRES_DDL if name == 'postgresql' else SQLITE_DDL if name == 'sqlite' else []
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def drop_search_index(connection):
+    """Drop the SQLite FTS5 table; PostgreSQL's column and index go with the table"""
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text('DROP TABLE IF EXISTS painting_fts'))
+
+
+def init_search(app):
+    """Create the search index along with the painting table and register the CLI command.
+
+    Call after the models are defined.
+    """
+    painting = app.extensions['sqlalchemy'].metadata.tables['painting']
+    event.listen(painting, 'after_create',
+                 lambda target, connection, **kw: create_search_index(connection))
+    event.listen(painting, 'after_drop',
+                 lambda target, connection, **kw: drop_search_index(connection))
+    app.cli.add_command(rebuild_search_index_command)
+
+
+def _encode_cursor(score, id):
+    raw = f'{score!r}|{id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        score, id = raw.split('|')
+        return float(score), int(id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _fts5_query(q):
+    """Quote each word so user input can't hit FTS5 query syntax; the last one is a prefix"""
+    terms = [f'"{term.replace(chr(34), chr(34) * 2)}"' for term in q.split()]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap the matched terms in <mark>"""
+    return str(escape(snippet or '')).replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+
+
+def _match(q, dialect):
+    """(match criterion, score, snippet) expressions for q; score is higher-is-better"""
+    from app import Painting
+    if dialect == 'postgresql':
+        search_vector = literal_column('painting.search_vector')
+        query = func.websearch_to_tsquery('english', q)
+        options = f'StartSel={START_SEL}, StopSel={STOP_SEL}, MaxWords=30, MinWords=12'
+        return (search_vector.op('@@')(query),
+                func.ts_rank_cd(search_vector, query),
+                func.ts_headline('english', func.coalesce(Painting.description, ''), query, options))
+    fts = literal_column('painting_fts')
+    # Column weights: title, description, medium, category, year
+    return (fts.op('MATCH')(_fts5_query(q)),
+            -func.bm25(fts, 10.0, 1.0, 4.0, 6.0, 4.0),
+            func.snippet(fts, 1, START_SEL, STOP_SEL, '…', 16))
+
+
+def search_filter(q):
+    """Criterion selecting the paintings that match q, or None if q has nothing to match"""
+    from app import db, Painting
+    dialect = _dialect(db.engine)
+    if dialect != 'postgresql' and not _fts5_query(q):
+        return None
+    match = _match(q, dialect)[0]
+    if dialect == 'postgresql':
+        return match
+    fts = table('painting_fts', column('rowid'))
+    return Painting.id.in_(select(fts.c.rowid).where(match))
+
+
+def search_painting_ids(q, cursor=None, limit=24, filters=()):
+    """Ranked page of available paintings matching q and the given filter criteria.
+
+    Returns ([(id, snippet html)], next_cursor); next_cursor is None on the last page.
+    """
+    from app import db, Painting
+    dialect = _dialect(db.engine)
+    if dialect != 'postgresql' and not _fts5_query(q):
+        return [], None
+    match, score, snippet = _match(q, dialect)
+
+    statement = select(Painting.id, score.label('score'), snippet.label('snippet'))
+    if dialect != 'postgresql':
+        fts = table('painting_fts', column('rowid'))
+        statement = statement.select_from(fts.join(Painting.__table__, Painting.id == fts.c.rowid))
+    statement = statement.where(match, Painting.available == True, *filters)
+
+    position = _decode_cursor(cursor)
+    if position is not None:
+        after_score, after_id = position
+        statement = statement.where(or_(score < after_score,
+                                        and_(score == after_score, Painting.id < after_id)))
+    statement = statement.order_by(score.desc(), Painting.id.desc()).limit(limit + 1)
+
+    try:
+        rows = db.session.execute(statement).all()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error searching paintings (run `flask rebuild-search-index`?): {e}")
+        return [], None
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].score, rows[-1].id)
+    return [(row.id, highlight(row.snippet)) for row in rows], next_cursor
+
+
+@click.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the painting search index if needed and re-index every painting."""
+    from app import db
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        if _dialect(connection) == 'sqlite':
+            connection.execute(text("INSERT INTO painting_fts (painting_fts) VALUES ('rebuild')"))
+    if _dialect(db.engine) == 'postgresql':
+        click.echo('search_vector is a generated column; PostgreSQL keeps it current')
+    click.echo('Search index ready')
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import cost of the app module and time to the first request
+
+    python startup_benchmark.py                          median of 5 fresh interpreters
+    python startup_benchmark.py --top 15                 also list the slowest imports
+    python startup_benchmark.py --max-first-request-ms 1500   exit 1 over budget (for CI)
+
+Each run starts a new interpreter, imports app, calls create_app() with the
+testing profile and serves one request through the test client, so it
+measures what a gunicorn worker or a test session pays before doing any
+work. The import breakdown comes from `python -X importtime`.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_REQUEST = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'status': status}))
+'''
+
+
+def measure_first_request(profile, path):
+    """Seconds for interpreter start, import, create_app and one request in a fresh process"""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST, profile, path],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['total'] = time.perf_counter() - started
+    return timings
+
+
+def measure_imports():
+    """[(module, self_us, cumulative_us)] for each module the app module imports directly"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    # importtime lists a module's imports, indented one level deeper, just before the module
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(self_us), int(cumulative_us)))
+        elif depth == 0:
+            if name.strip() == 'app':
+                return children
+            children = []
+    return children
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app import and first-request time')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to take the median of')
+    parser.add_argument('--profile', default='testing', help='config.CONFIGS profile for create_app()')
+    parser.add_argument('--path', default='/about', help='Path of the first request')
+    parser.add_argument('--top', type=int, default=0, help='List the N slowest top-level imports')
+    parser.add_argument('--max-import-ms', type=float, help='Fail if importing app takes longer')
+    parser.add_argument('--max-first-request-ms', type=float,
+                        help='Fail if interpreter start to first response takes longer')
+    args = parser.parse_args()
+
+    runs = [measure_first_request(args.profile, args.path) for _ in range(args.runs)]
+    if any(run['status'] >= 500 for run in runs):
+        print(f"Error: {args.path} returned {runs[0]['status']}")
+        sys.exit(1)
+    median = {key: statistics.median([run[key] for run in runs]) * 1000
+              for key in ('import', 'create_app', 'first_request', 'total')}
+    print(f"median of {args.runs} runs (ms): import app {median['import']:.0f}, "
+          f"create_app {median['create_app']:.0f}, first request {median['first_request']:.0f}, "
+          f"process start to response {median['total']:.0f}")
+
+    if args.top:
+        print(f"\n{'cumulative ms':>13} {'self ms':>8}  module imported by app")
+        for name, self_us, cumulative_us in sorted(measure_imports(), key=lambda m: -m[2])[:args.top]:
+            print(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {name}")
+
+    over = []
+    if args.max_import_ms is not None and median['import'] > args.max_import_ms:
+        over.append(f"import app {median['import']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_first_request_ms is not None and median['total'] > args.max_first_request_ms:
+        over.append(f"first request {median['total']:.0f} ms > {args.max_first_request_ms:.0f} ms")
+    if over:
+        print('Over budget: ' + '; '.join(over))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
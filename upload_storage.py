@@ -0,0 +1,149 @@
+"""
+Content-addressed upload storage with dedup, garbage collection and immutable serving
+"""
+import glob
+import hashlib
+import os
+import shutil
+import time
+import uuid
+import click
+from flask import Blueprint, abort, current_app, send_from_directory
+from werkzeug.utils import secure_filename
+
+media = Blueprint('media', __name__)
+
+MEDIA_URL_PREFIX = '/media'
+READ_BLOCK = 1024 * 1024
+ONE_YEAR = 365 * 24 * 3600
+
+
+def _extension(filename):
+    ext = secure_filename(filename).rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def content_filename(sha256, original_name):
+    """Storage name for content with the given hash"""
+    return f'{sha256}.{_extension(original_name)}'
+
+
+def media_url(filename):
+    return f'{MEDIA_URL_PREFIX}/{filename}'
+
+
+def store_file(path, sha256, original_name, upload_folder):
+    """Move a fully written file into content-addressed storage.
+
+    If identical content is already stored the new copy is discarded.
+    Returns the storage filename.
+    """
+    filename = content_filename(sha256, original_name)
+    target = os.path.join(upload_folder, filename)
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        shutil.move(path, target)
+    return filename
+
+
+def store_upload(file_storage, upload_folder):
+    """Stream an uploaded file to disk while hashing it, then store it by content hash"""
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(upload_folder, f'.incoming-{uuid.uuid4().hex}')
+    with open(tmp_path, 'wb') as f:
+        for block in iter(lambda: file_storage.stream.read(READ_BLOCK), b''):
+            digest.update(block)
+            f.write(block)
+    return store_file(tmp_path, digest.hexdigest(), file_storage.filename, upload_folder)
+
+
+def _content_stem(filename):
+    # Content-addressed names are '<sha256>.<ext>'; legacy uploads are '<uuid>_<name>'
+    return filename.split('_', 1)[0].rsplit('.', 1)[0]
+
+
+def reference_count(filename):
+    """Number of Painting and Exhibition rows using a stored original"""
+    from app import Painting, Exhibition
+    return sum(model.query.filter_by(image_original=filename).count()
+               for model in (Painting, Exhibition))
+
+
+def release(filename):
+    """Delete a stored original and its renditions once no row references it"""
+    if not filename or reference_count(filename):
+        return False
+    folder = current_app.config['UPLOAD_FOLDER']
+    stem = glob.escape(_content_stem(filename))
+    paths = [os.path.join(folder, filename)]
+    paths += glob.glob(os.path.join(folder, stem + '-v*_*'))  # renditions of every version
+    paths += glob.glob(os.path.join(folder, stem + '_*'))  # legacy uuid-named files
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    return True
+
+
+def referenced_files():
+    """Every file in the upload folder that some row still points at"""
+    from app import Painting, Exhibition
+    from image_service import FORMATS, RENDITIONS, rendition_filename
+    referenced = set()
+    for model in (Painting, Exhibition):
+        rows = model.query.with_entities(model.image_original, model.image_key, model.image_url).all()
+        for image_original, image_key, image_url in rows:
+            if image_original:
+                referenced.add(image_original)
+            if image_key:
+                referenced.update(rendition_filename(image_key, name, fmt)
+                                  for name in RENDITIONS for fmt in FORMATS)
+            if image_url:
+                referenced.add(image_url.rsplit('/', 1)[-1])
+    return referenced
+
+
+def collect_garbage(grace=3600, dry_run=False):
+    """Delete unreferenced uploads older than grace seconds; returns the names removed"""
+    folder = current_app.config['UPLOAD_FOLDER']
+    referenced = referenced_files()
+    cutoff = time.time() - grace
+    removed = []
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name == '.gitkeep' or name in referenced or not os.path.isfile(path):
+            continue
+        if os.path.getmtime(path) >= cutoff:
+            continue
+        if not dry_run:
+            os.remove(path)
+        removed.append(name)
+    return removed
+
+
+@media.route(f'{MEDIA_URL_PREFIX}/<path:filename>')
+def serve_media(filename):
+    """Serve stored uploads; names change whenever content does, so they never expire"""
+    if '/' in filename or filename.startswith('.'):
+        abort(404)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=ONE_YEAR, etag=filename.rsplit('.', 1)[0])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command('gc-uploads')
+@click.option('--grace', type=int, default=3600, help='Keep unreferenced files newer than this (seconds)')
+@click.option('--dry-run', is_flag=True, help='List files without deleting them')
+def gc_uploads_command(grace, dry_run):
+    """Delete uploaded files no painting or exhibition references."""
+    removed = collect_garbage(grace, dry_run)
+    for name in removed:
+        click.echo(name)
+    click.echo(f'{"Would remove" if dry_run else "Removed"} {len(removed)} file(s)')
+
+
+def init_upload_storage(app):
+    app.register_blueprint(media)
+    app.cli.add_command(gc_uploads_command)